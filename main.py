@@ -1,4 +1,3 @@
-import copy
 
 import pandas as pd
 
@@ -14,7 +13,7 @@ def Ritta():
     loan3 = Loan(loan_type="Mishtana", amount=150000, num_of_months=240, interest_rate=3.1, grace_period=0)
 
     mortgage = Mortgage([loan1, loan2, loan3])
-    mortgage.display_mortgage_info()
+    mortgage.display_mortgage_info(verbose=True)
 
     mortgage.to_dataframe().to_csv('./customers/ritta.csv', index=False)
 
@@ -40,12 +39,12 @@ def get_nariman_mortgage():
 
 def NarimanRecycle():
     mortgage = get_nariman_mortgage()
-    mortgage.display_mortgage_info()
+    mortgage.display_mortgage_info(verbose=True)
 
     # plot_interest_principal_graph_yearly(mortgage.amortization_schedule)
     # mortgage = Mortgage.recycle_mortgage(mortgage, 50000, change='period')
     #
-    # mortgage.display_mortgage_info()
+    # mortgage.display_mortgage_info(verbose=True)
     #
     EQinvestment = StocksMarketInvestment(initial_fund=50000)
     MortgageRecycleinvestmentPayement = MortgageRecycleInvestment(initial_fund=50000, mortgage=mortgage,
@@ -54,9 +53,9 @@ def NarimanRecycle():
                                                                 change='period', name='Reduce Period')
 
     print("Lower Payement")
-    MortgageRecycleinvestmentPayement.recycled_mortgage.display_mortgage_info()
+    MortgageRecycleinvestmentPayement.recycled_mortgage.display_mortgage_info(verbose=True)
     print("Shorter Period")
-    MortgageRecycleinvestmentPeriod.recycled_mortgage.display_mortgage_info()
+    MortgageRecycleinvestmentPeriod.recycled_mortgage.display_mortgage_info(verbose=True)
 
     plot_compare_investment_revenue_graph_yearly([MortgageRecycleinvestmentPayement, MortgageRecycleinvestmentPeriod],
                                                  field="Total Revenue")
@@ -91,19 +90,19 @@ def get_george_mortgage() -> Mortgage:
     loansAL.append(Loan(loan_type="PrimeAL2", amount=28034 + 59468, num_of_months=190, interest_rate=P - 0.55, cpi=0))
 
     mortgage = Mortgage(loansBY + loansTS + loansAL)
-    mortgage.display_mortgage_info()
+    mortgage.display_mortgage_info(verbose=True)
 
     return mortgage
 
 
 def get_george_new_apartment_mortgage():
     mortgage = get_george_mortgage()
-    mortgage.display_mortgage_info()
-    old_mortgage = copy.deepcopy(mortgage)
+    mortgage.display_mortgage_info(verbose=True)
+    old_mortgage = mortgage.clone()
 
     new_loan = Loan(loan_type="newPrime", amount=475000, num_of_months=15 * 12, interest_rate=5.4)
     mortgage.add_loan(new_loan)
-    mortgage.display_mortgage_info()
+    mortgage.display_mortgage_info(verbose=True)
     print_amortization_schedule_yearly(mortgage.amortization_schedule)
 
     plot_monthly_payments_graph_yearly(mortgage.amortization_schedule)
@@ -122,7 +121,7 @@ def alfred_alternatives_450k():
                                                           monthly_rental_income=RentalMonthlyRatio * 3500,
                                                           buying_costs=TaxBuyingPercentage/100 * new_apartment_price)
 
-    REinvestment.mortgage.display_mortgage_info()
+    REinvestment.mortgage.display_mortgage_info(verbose=True)
     EQinvestment = StocksMarketInvestment(initial_fund=450000, yearly_return=StocksMarketYearlyReturn, monthly_extra=0)
 
     plot_compare_investment_revenue_graph_yearly(
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from loan import Loan, LoanBatch, LoanType
+from mortgage import Mortgage
+from portfolio import MortgagePortfolio
+
+
+def random_loan_terms(num_loans, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'amount': rng.uniform(50000, 1000000, num_loans).round(),
+            'num_of_months': rng.integers(12, 361, num_loans),
+            'interest_rate': rng.uniform(1, 7, num_loans).round(2),
+            'grace_period': rng.choice([0, 0, 0, 6, 12], num_loans),
+            'cpi': rng.choice([0, 2.5], num_loans)}
+
+
+def timed(function, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def loan_batch_throughput(num_loans=10000):
+    terms = random_loan_terms(num_loans)
+    batch_ms = timed(lambda: LoanBatch(**terms))
+
+    num_scalar = min(num_loans, 500)
+    scalar_ms = timed(lambda: [Loan(terms['amount'][i], int(terms['num_of_months'][i]), terms['interest_rate'][i],
+                                    grace_period=int(terms['grace_period'][i]), cpi=terms['cpi'][i]).schedule
+                               for i in range(num_scalar)], repeat=1)
+
+    print(f"LoanBatch: {num_loans} loans in {batch_ms:,.1f} ms ({num_loans / batch_ms:,.1f} loans/ms)")
+    print(f"Loan:      {num_scalar} loans in {scalar_ms:,.1f} ms ({num_scalar / scalar_ms:,.2f} loans/ms)")
+
+
+def rate_path_throughput(num_paths=10000, num_of_months=300):
+    rng = np.random.default_rng(0)
+    loan = Loan(300000, num_of_months, 4.5, cpi=2.5)
+    rate_paths = 4.5 + np.cumsum(rng.normal(0, 0.1, (num_paths, num_of_months)), axis=1)
+    cpi_paths = 2.5 + np.cumsum(rng.normal(0, 0.1, (num_paths, num_of_months)), axis=1)
+    paths_ms = timed(lambda: loan.simulate(rate_paths, cpi_paths))
+    print(f"Loan.simulate: {num_paths} rate/CPI paths of {num_of_months} months in {paths_ms:,.1f} ms "
+          f"({num_paths / paths_ms:,.1f} paths/ms)")
+
+
+def compact_schedule_memory(num_loans=1000):
+    terms = random_loan_terms(num_loans)
+    modes = {'float64, all columns': {},
+             'float32, all columns': {'compact': True},
+             'float32, payment and balance': {'compact': True,
+                                              'keep_columns': ['Monthly Payment', 'Remaining Balance']}}
+    for mode, options in modes.items():
+        loans = [Loan(terms['amount'][i], int(terms['num_of_months'][i]), terms['interest_rate'][i],
+                      grace_period=int(terms['grace_period'][i]), cpi=terms['cpi'][i], **options)
+                 for i in range(num_loans)]
+        nbytes = sum(loan.schedule.nbytes for loan in loans)
+        print(f"{mode:30}: {nbytes / 2 ** 20:,.2f} MiB per {num_loans} loans")
+
+
+def mortgage_update_throughput(num_loans=200):
+    terms = random_loan_terms(num_loans)
+
+    def payback_every_loan():
+        loans = [Loan(terms['amount'][i], int(terms['num_of_months'][i]), terms['interest_rate'][i],
+                      grace_period=int(terms['grace_period'][i]), cpi=terms['cpi'][i]) for i in range(num_loans)]
+        mortgage = Mortgage(loans)
+        for i in range(num_loans):
+            mortgage.payback_loan(i, 10000)
+
+    update_ms = timed(payback_every_loan, repeat=1)
+    print(f"Mortgage.payback_loan: {num_loans} updates of a {num_loans} loan mortgage in {update_ms:,.1f} ms")
+
+
+def recycle_throughput(num_loans=50, extra_payment=1000000):
+    terms = random_loan_terms(num_loans)
+    mortgage = Mortgage([Loan(terms['amount'][i], int(terms['num_of_months'][i]), terms['interest_rate'][i],
+                              grace_period=int(terms['grace_period'][i]), cpi=terms['cpi'][i])
+                         for i in range(num_loans)])
+    for change in ['payment', 'period']:
+        for exact in [False, True]:
+            recycle_ms = timed(lambda: Mortgage.recycle_mortgage(mortgage, extra_payment, change=change, exact=exact))
+            print(f"Mortgage.recycle_mortgage: {extra_payment:,} over {num_loans} loans, change={change}, "
+                  f"exact={exact} in {recycle_ms:,.1f} ms")
+    extra_payments = np.linspace(0, mortgage.loan_amount(), 101)
+    sweep_ms = timed(lambda: Mortgage.recycle_sweep(mortgage, extra_payments))
+    print(f"Mortgage.recycle_sweep: {len(extra_payments)} lump sums over {num_loans} loans, both changes in "
+          f"{sweep_ms:,.1f} ms")
+
+
+def random_book(num_mortgages, max_loans=5, seed=0):
+    "A loans frame of num_mortgages mortgages of 1 to max_loans loans each, the CSV layout of the customer files."
+    rng = np.random.default_rng(seed)
+    mortgage = np.repeat(np.arange(num_mortgages), rng.integers(1, max_loans + 1, num_mortgages))
+    terms = random_loan_terms(len(mortgage), seed)
+    return pd.DataFrame({'mortgage': mortgage, 'amount': terms['amount'], 'num_of_months': terms['num_of_months'],
+                         'interest_rate': terms['interest_rate'],
+                         'loan_type': rng.choice([loan_type.name for loan_type in LoanType], len(mortgage)),
+                         'grace_period': terms['grace_period'], 'cpi': terms['cpi'] > 0})
+
+
+def portfolio_throughput(book_sizes=(10000, 100000)):
+    for num_mortgages in book_sizes:
+        book = random_book(num_mortgages)
+        portfolio_ms = timed(lambda: MortgagePortfolio.from_frame(book).summary(), repeat=1)
+        print(f"MortgagePortfolio.summary: {num_mortgages:,} mortgages ({len(book):,} loans) in {portfolio_ms:,.1f} ms "
+              f"({num_mortgages / portfolio_ms:,.1f} mortgages/ms)")
+
+    num_scalar = 200
+    frames = [frame.drop(columns='mortgage') for _, frame in random_book(num_scalar).groupby('mortgage')]
+    scalar_ms = timed(lambda: [Mortgage.from_dataframe(frame).summary() for frame in frames], repeat=1)
+    print(f"Mortgage.summary:          {num_scalar} mortgages in {scalar_ms:,.1f} ms "
+          f"({num_scalar / scalar_ms:,.2f} mortgages/ms)")
+
+
+def storage_throughput(num_mortgages=100000):
+    portfolio = MortgagePortfolio.from_frame(random_book(num_mortgages))
+    compute_ms = timed(lambda: portfolio.summary(), repeat=1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'book.npz')
+        portfolio.save(path, columns=['Monthly Payment', 'Remaining Balance'], dtype=np.float32)
+        load_ms = timed(lambda: MortgagePortfolio.load(path).summary())
+        size = os.path.getsize(path)
+    print(f"MortgagePortfolio.load: {num_mortgages:,} mortgages ({size / 2 ** 20:,.1f} MiB) in {load_ms:,.1f} ms, "
+          f"computing them takes {compute_ms:,.1f} ms")
+
+
+if __name__ == '__main__':
+    loan_batch_throughput()
+    rate_path_throughput()
+    compact_schedule_memory()
+    mortgage_update_throughput()
+    recycle_throughput()
+    portfolio_throughput()
+    storage_throughput()
@@ -65,7 +65,7 @@ def load_mortgage_csv():
 
 def display_amortization_table(mortgage, amortization_type):
     if amortization_type == 'Annual':
-        amortization = Loan.get_yearly_amortization(mortgage.amortization_schedule)
+        amortization = Loan.get_yearly_amortization(mortgage.schedule)
     else:
         amortization = np.round(mortgage.amortization_schedule.astype(int))
     st.table(amortization.set_index('Month'))
@@ -105,7 +105,7 @@ def display_table_with_total_row(mortgage_info):
 
 
 def plot_annual_amortization_monthly_line(mortgages, field):
-    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.amortization_schedule) for mortgage in mortgages]
+    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.schedule) for mortgage in mortgages]
     st.line_chart({f"{mortgages[i].name}": yearly_amortization[field] // 12 for i, yearly_amortization in
      enumerate(yearly_amortizations)})
 
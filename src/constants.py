@@ -7,3 +7,7 @@ RealEstateYearlyAppreciation = 5.0
 StocksMarketYearlyReturn = 7.0
 StocksMarketFeesPercentage = 0.8
 MortgageRecycleIterationAmount = 10000
+MaxLoanMonths = 360
+BalanceDecimals = 6  # Balances are kept to a millionth, anything below is float noise of summed payments
+AmortizationCacheSize = 1024
+PortfolioChunkSize = 1000
@@ -1,8 +1,10 @@
+import numpy as np
 import pandas as pd
 from constants import *
 from loan import Loan, LoanType
 from mortgage import Mortgage
-import numpy_financial as npf
+from irr import irr
+from schedule import yearly_rollup
 
 
 class Investment:
@@ -11,6 +13,35 @@ class Investment:
         self.initial_fund = initial_fund
         self.investment_years = investment_years
         self.name = name
+        self._amortization_schedule = None
+        self._cumulative = {}
+        self._yearly_amortization = None
+
+    @property
+    def amortization_schedule(self) -> pd.DataFrame:
+        return self._amortization_schedule
+
+    @amortization_schedule.setter
+    def amortization_schedule(self, amortization_schedule):
+        self._amortization_schedule = amortization_schedule
+        self._cumulative = {}
+        self._yearly_amortization = None
+
+    def _total(self, column, month=None):
+        # Prefix sums of the schedule column make every "total up to month" query a single lookup.
+        if column not in self._cumulative:
+            self._cumulative[column] = np.cumsum(self.amortization_schedule[column].to_numpy(dtype=float))
+        cumulative = self._cumulative[column]
+        if month is None:
+            month = len(cumulative) - 1
+        if month < 0 or len(cumulative) == 0:
+            return 0.0
+        return cumulative[min(month, len(cumulative) - 1)]
+
+    def yearly_amortization(self) -> pd.DataFrame:
+        if self._yearly_amortization is None:
+            self._yearly_amortization = Investment.get_yearly_amortization(self.amortization_schedule)
+        return self._yearly_amortization
 
     def get_initial_investment(self):
         return self.initial_fund
@@ -24,10 +55,7 @@ class Investment:
         return self
 
     def total_income_payments(self, month=None):
-        if month is not None:
-            return self.amortization_schedule.loc[:month, 'Income'].sum()
-        else:
-            return self.amortization_schedule['Income'].sum()
+        return self._total('Income', month)
 
     def total_assets(self, month=None):
         if month is not None:
@@ -42,10 +70,7 @@ class Investment:
             return round(self.amortization_schedule['Total Liabilities'].iloc[-1])
 
     def total_expenses_payments(self, month=None):
-        if month is not None:
-            return self.amortization_schedule.loc[:month, 'Expenses'].sum()
-        else:
-            return self.amortization_schedule['Expenses'].sum()
+        return self._total('Expenses', month)
 
     def total_revenue(self, month=None):
         if month is not None:
@@ -76,17 +101,11 @@ class Investment:
 
     @staticmethod
     def get_yearly_amortization(amortization_schedule):
-        yearly_amortization = amortization_schedule.groupby(amortization_schedule.index // 12).agg({
-            'Month': 'last',
-            'Total Assets': 'last',
-            'Total Liabilities': 'last',
-            'Income': 'sum',
-            'Expenses': 'sum',
-            'Monthly Extra': 'sum',
-            'Total Revenue': 'last',
-            'Net Revenue': 'last',
-        }).astype({'Month': int, 'Total Assets': int, 'Expenses': int, 'Total Revenue': int,
-                   'Net Revenue': int, 'Income': int})
+        aggregations = {'Month': 'last', 'Total Assets': 'last', 'Total Liabilities': 'last', 'Income': 'sum',
+                        'Expenses': 'sum', 'Monthly Extra': 'sum', 'Total Revenue': 'last', 'Net Revenue': 'last'}
+        columns = {name: amortization_schedule[name].to_numpy() for name in aggregations}
+        yearly_amortization = pd.DataFrame(yearly_rollup(columns, aggregations)).astype({
+            'Month': int, 'Total Assets': int, 'Expenses': int, 'Total Revenue': int, 'Net Revenue': int, 'Income': int})
 
         return yearly_amortization
 
@@ -103,39 +122,43 @@ class StocksMarketInvestment(Investment):
         self.amortization_schedule = self.generate_amortization_schedule(investment_years)
 
     def generate_amortization_schedule(self, investment_years):
-        amortization_schedule = []
-        current_asset_price = self.initial_fund
+        """
+        Every month the assets grow by the monthly return, receive the monthly extra and then pay the fee, a linear
+        recurrence with the closed form A_m = A_0 g^m + b (g^m - 1) / (g - 1), where g = (1 + r)(1 - f) and
+        b = extra * (1 - f). The whole schedule is computed from it at once.
+        """
         monthly_return = (1 + self.yearly_return / 100) ** (1 / 12) - 1
         monthly_fee_percent = (1 + self.yearly_fee_percent / 100) ** (1 / 12) - 1
-        investment_num_months = int(investment_years * 12)
-
-        for month in range(1, investment_num_months + 1):
-            previous_asset_price = current_asset_price
-            current_asset_price = previous_asset_price * (1 + monthly_return) + self.monthly_extra
-            interest = previous_asset_price * monthly_return
-            monthly_expenses = monthly_fee_percent * current_asset_price + self.monthly_extra
-            current_asset_price -= monthly_fee_percent * current_asset_price
-            total_revenue = current_asset_price - self.initial_fund - month * self.monthly_extra
-            taxes = self.gain_tax / 100 * total_revenue
-            net_revenue = total_revenue if total_revenue <= 0 else total_revenue-taxes
-            amortization_schedule.append({
-                'Month': month,
-                'Monthly Extra':self.monthly_extra,
-                'Income': 0,
-                'Expenses': monthly_expenses,
-                'Total Assets': current_asset_price,
-                'Total Liabilities': 0,
-                'Total Revenue': total_revenue,
-                'Net Revenue': net_revenue
-            })
-
-        return pd.DataFrame(amortization_schedule)
+        months = np.arange(1, int(investment_years * 12) + 1)
+
+        growth = (1 + monthly_return) * (1 - monthly_fee_percent)
+        deposits = self.monthly_extra * (1 - monthly_fee_percent)
+        compounded = growth ** months
+        accumulated_deposits = deposits * months if growth == 1 else deposits * (compounded - 1) / (growth - 1)
+        assets = self.initial_fund * compounded + accumulated_deposits
+
+        # The value before the month's fee, grown from the previous month's assets
+        previous_assets = np.concatenate([[self.initial_fund], assets[:-1]])[:len(months)]
+        before_fee = previous_assets * (1 + monthly_return) + self.monthly_extra
+        total_revenue = assets - self.initial_fund - months * self.monthly_extra
+        net_revenue = np.where(total_revenue <= 0, total_revenue, total_revenue * (1 - self.gain_tax / 100))
+
+        return pd.DataFrame({
+            'Month': months,
+            'Monthly Extra': np.full(len(months), self.monthly_extra),
+            'Income': np.zeros(len(months), dtype=int),
+            'Expenses': monthly_fee_percent * before_fee + self.monthly_extra,
+            'Total Assets': assets,
+            'Total Liabilities': np.zeros(len(months), dtype=int),
+            'Total Revenue': total_revenue,
+            'Net Revenue': net_revenue
+        })
 
     def get_irr(self):
-        annual_amortization = Investment.get_yearly_amortization(self.amortization_schedule)
+        annual_amortization = self.yearly_amortization()
         taxes = self.amortization_schedule['Net Revenue'].iloc[-1] - self.amortization_schedule['Total Revenue'].iloc[-1]
         cashflow = [-self.initial_fund] + [0]*len(annual_amortization) + [self.total_assets() - taxes]
-        return npf.irr(cashflow) * 100
+        return irr(cashflow, guess=self.yearly_return / 100) * 100
 
 
 class RealEstateInvestment(Investment):
@@ -233,11 +256,11 @@ class RealEstateInvestment(Investment):
             -1] + self.buying_costs
 
     def get_irr(self):
-        annual_amortization = Investment.get_yearly_amortization(self.amortization_schedule)
+        annual_amortization = self.yearly_amortization()
         cashflow = [-self.buying_costs - self.initial_fund]+list(
             annual_amortization['Income'] - annual_amortization['Expenses']) + [
                            self.net_worth()]
-        return npf.irr(cashflow) * 100
+        return irr(cashflow, guess=self.appreciation_rate / 100) * 100
 
     @staticmethod
     def quick_calculation(price, down_payment, interest_rate, appreciation_rate, investment_years,
@@ -316,6 +339,7 @@ class MortgageRecycleInvestment(Investment):
         return pd.DataFrame(amortization_schedule)
 
     def get_irr(self):
-        return npf.irr([-self.initial_fund] +
+        return irr([-self.initial_fund] +
             list(
-                self.amortization_schedule['Income'] - self.amortization_schedule['Expenses']) + [self.initial_fund]) * 12 * 100
+                self.amortization_schedule['Income'] - self.amortization_schedule['Expenses']) + [self.initial_fund],
+                   guess=self.investment_yearly_return / 12 / 100) * 12 * 100
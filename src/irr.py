@@ -0,0 +1,63 @@
+import numpy as np
+from scipy.optimize import brentq
+
+
+def irr(cashflow, guess=0.01):
+    """
+    Periodic internal rate of return of a cash flow, the same quantity npf.irr returns.
+    Newton iterations warm-started from guess (e.g. the contract rate), with a bracketed Brent fallback.
+    Returns NaN when the cash flow has no rate of return.
+    """
+    return irr_batch([cashflow], guess)[0]
+
+
+def irr_batch(cashflows, guess=0.01, tol=1e-12, max_iterations=50):
+    """
+    Internal rates of return of many cash flows at once. cashflows is a (flows, periods) matrix (shorter flows padded
+    with zeros) and guess is a scalar or one starting rate per flow. All flows take their Newton steps together.
+    """
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    num_flows, num_periods = cashflows.shape
+    rates = np.array(np.broadcast_to(np.asarray(guess, dtype=float), (num_flows,)))
+    periods = np.arange(num_periods)
+
+    has_return = (cashflows.min(axis=1) < 0) & (cashflows.max(axis=1) > 0)
+    active = has_return.copy()
+    converged = np.zeros(num_flows, dtype=bool)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            if not active.any():
+                break
+            rate = rates[active]
+            flows = cashflows[active]
+            discount = np.exp(-np.log1p(rate)[:, None] * periods)
+            npv = (flows * discount).sum(axis=1)
+            derivative = -(flows * periods * discount).sum(axis=1) / (1 + rate)
+            step = npv / derivative
+            new_rate = rate - step
+            # Newton can jump past -100%, back off half way towards it instead
+            new_rate = np.where(new_rate <= -1, (rate - 1) / 2, new_rate)
+
+            done = np.abs(step) <= tol * (1 + np.abs(rate))
+            rates[active] = new_rate
+            indices = np.flatnonzero(active)
+            converged[indices[done]] = True
+            active[indices[done | ~np.isfinite(new_rate)]] = False
+
+    for i in np.flatnonzero(has_return & ~(converged & np.isfinite(rates))):
+        rates[i] = _bracketed_irr(cashflows[i])
+    rates[~has_return] = np.nan
+    return rates
+
+
+def _bracketed_irr(cashflow):
+    # Fall back to Brent's method on the sign change of the NPV closest to a zero rate
+    grid = np.concatenate([-1 + np.geomspace(1e-4, 1, 40, endpoint=False), np.linspace(0, 10, 201)])
+    npv = lambda rate: np.sum(cashflow * np.exp(-np.log1p(rate) * np.arange(len(cashflow))))
+    with np.errstate(over='ignore', invalid='ignore'):
+        values = np.array([npv(rate) for rate in grid])
+    brackets = np.flatnonzero(np.isfinite(values[:-1]) & np.isfinite(values[1:]) & (values[:-1] * values[1:] <= 0))
+    if len(brackets) == 0:
+        return np.nan
+    i = brackets[np.argmin(np.abs(grid[brackets]))]
+    return brentq(npv, grid[i], grid[i + 1], xtol=1e-14)
@@ -1,9 +1,13 @@
+import copy
 import numpy as np
 import pandas as pd
-import numpy_financial as npf
-from constants import CPI
+from constants import CPI, MaxLoanMonths, AmortizationCacheSize, BalanceDecimals
 from finance_utils import CPIVAR,PrimeInterestVAR
+from schedule import LoanSchedule, yearly_rollup, YEARLY_AGGREGATIONS
+from summary import LoanSummary
+from irr import irr, irr_batch
 from enum import Enum
+from functools import lru_cache
 
 
 class LoanType(Enum):
@@ -12,8 +16,197 @@ class LoanType(Enum):
     PRIME = 'Prime'
 
 
+def amortize(amount, num_of_months, interest_rate, grace_period=0, cpi=CPI):
+    """
+    Closed-form CPI-indexed annuity schedule of a single loan, computed for the whole term at once.
+    Returns the (payment, principal, inflation, interest, balance) vectors.
+    """
+    return tuple(column[0] for column in amortize_batch([amount], [num_of_months], [interest_rate], [grace_period], [cpi]))
+
+
+def amortize_batch(amount, num_of_months, interest_rate, grace_period=0, cpi=CPI):
+    """
+    Closed-form CPI-indexed annuity schedules of many loans at once.
+    Re-amortizing the indexed balance every month keeps the real payment constant, so month j of the amortization
+    phase pays amount * c^(j+1) * r(1+r)^n / ((1+r)^n - 1) and the balance follows the standard annuity curve scaled
+    by c^(j+1). The grace period months pay nothing and keep the balance unchanged.
+    Returns the (payment, principal, inflation, interest, balance) matrices of shape (loans, months), zero padded
+    past the end of each loan. Per-month (loans, months) rate or CPI matrices are re-amortized by amortize_paths.
+    """
+    if np.ndim(interest_rate) == 2 or np.ndim(cpi) == 2:
+        return amortize_paths(amount, num_of_months, interest_rate, grace_period, cpi)
+
+    amount, num_of_months, interest_rate, grace_period, cpi = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(values, dtype=float)) for values in
+          (amount, num_of_months, interest_rate, grace_period, cpi)))
+    amount, r, monthly_cpi, grace = (values[:, None] for values in
+                                     (amount, (interest_rate / 12) / 100, 1 + (cpi / 12) / 100, grace_period))
+    n = np.maximum(num_of_months - grace_period, 0)[:, None]
+    max_months = int(np.max(np.maximum(num_of_months, grace_period), initial=0))
+
+    j = np.arange(max_months)[None, :] - grace
+    in_grace = j < 0
+    active = ~in_grace & (j < n)
+    periods = np.maximum(n, 1)  # keeps the factors finite when there is no amortization phase
+
+    zero_rate = r == 0
+    log_growth = np.log1p(r)
+    growth = np.exp(log_growth * periods)
+    denominator = np.where(zero_rate, 1, growth - 1)
+    annuity_factor = np.where(zero_rate, 1 / periods, r * growth / denominator)
+    if zero_rate.any():
+        balance_ratio = np.where(zero_rate, (periods - j) / periods, (growth - np.exp(log_growth * j)) / denominator)
+    else:
+        balance_ratio = (growth - np.exp(log_growth * j)) / denominator
+
+    indexation = np.exp(np.log(monthly_cpi) * (j + 1)) * active
+    payment = (amount * annuity_factor) * indexation
+    indexed_balance = amount * indexation * balance_ratio
+    interest = indexed_balance * r
+    inflation = indexed_balance * (1 - 1 / monthly_cpi)
+    principal = payment - interest
+    balance = indexed_balance - principal
+    if in_grace.any():
+        balance += amount * in_grace
+    return payment, principal, inflation, interest, balance
+
+
+def amortize_paths(amount, num_of_months, interest_rate, grace_period=0, cpi=CPI):
+    """
+    Amortization under per-month annual interest rate and CPI paths, one row per loan or scenario path.
+    interest_rate and cpi are (rows, months) matrices indexed by loan month (a constant per row is also accepted);
+    paths shorter than the loan repeat their last value. Every month the indexed balance is re-amortized over the
+    remaining term at that month's rate, so the balance is amount times the running products of the monthly CPI
+    factors and of the per-month annuity balance ratios, which are cumulative products along the month axis.
+    Returns the (payment, principal, inflation, interest, balance) matrices, zero padded past the end of each row.
+    """
+    rates, cpis = (np.asarray(values, dtype=float) for values in (interest_rate, cpi))
+    rates, cpis = (values.reshape(-1, 1) if values.ndim < 2 else values for values in (rates, cpis))
+    num_rows = np.broadcast_shapes(np.shape(amount), np.shape(num_of_months), np.shape(grace_period),
+                                   rates.shape[:1], cpis.shape[:1])
+    amount, num_of_months, grace_period = (np.broadcast_to(np.asarray(values, dtype=float), num_rows)[:, None] for
+                                           values in (amount, num_of_months, grace_period))
+    max_months = int(np.max(np.maximum(num_of_months, grace_period), initial=0))
+
+    def month_matrix(paths):
+        if paths.shape[1] < max_months:
+            paths = np.pad(paths, ((0, 0), (0, max_months - paths.shape[1])), mode='edge')
+        return np.broadcast_to(paths[:, :max_months], (num_rows[0], max_months))
+
+    r = month_matrix(rates) / 12 / 100
+    monthly_cpi = 1 + month_matrix(cpis) / 12 / 100
+
+    n = np.maximum(num_of_months - grace_period, 0)
+    j = np.arange(max_months)[None, :] - grace_period
+    in_grace = j < 0
+    active = ~in_grace & (j < n)
+    remaining = np.where(active, n - j, 1)
+
+    zero_rate = r == 0
+    growth = np.exp(np.log1p(r) * remaining)
+    denominator = np.where(zero_rate, 1, growth - 1)
+    annuity_factor = np.where(zero_rate, 1 / remaining, r * growth / denominator)
+    balance_ratio = np.where(zero_rate, (remaining - 1) / remaining, (growth - (1 + r)) / denominator)
+
+    indexation = np.cumprod(np.where(active, monthly_cpi, 1), axis=1)
+    carried = np.cumprod(np.where(active, balance_ratio, 1), axis=1)
+    carried = np.concatenate([np.ones((num_rows[0], 1)), carried[:, :-1]], axis=1)
+
+    indexed_balance = amount * indexation * carried * active
+    payment = indexed_balance * annuity_factor
+    interest = indexed_balance * r
+    inflation = indexed_balance * (1 - 1 / monthly_cpi)
+    principal = payment - interest
+    balance = indexed_balance - principal + amount * in_grace
+    return payment, principal, inflation, interest, balance
+
+
+@lru_cache(maxsize=AmortizationCacheSize)
+def unit_amortization(num_of_months, interest_rate, grace_period, cpi):
+    """
+    Schedule columns of a loan of amount 1. Amortization is linear in the principal, so any loan with the same terms
+    is this schedule scaled by its amount. Bounded LRU cache, hit/miss statistics via unit_amortization.cache_info().
+    """
+    columns = amortize(1, num_of_months, interest_rate, grace_period, cpi)
+    for column in columns:
+        column.flags.writeable = False
+    return columns
+
+
+class LoanBatch:
+    """
+    Amortization of many loans in one array computation. Every schedule column is a (loans, months) matrix padded
+    with zeros past the end of each loan, so whole books of loans can be priced without a Loan object per loan.
+    """
+    def __init__(self, amount, num_of_months, interest_rate, grace_period=0, cpi=CPI):
+        """
+        All terms are scalars or one value per loan. interest_rate and cpi may also be (loans, months) matrices of
+        per-month annual rates, e.g. scenario paths of a single loan.
+        """
+        self.interest_rate, self.cpi = (np.asarray(values, dtype=float) for values in (interest_rate, cpi))
+        num_loans = np.broadcast_shapes(np.shape(amount), np.shape(num_of_months), np.shape(grace_period),
+                                        np.shape(self.interest_rate)[:1], np.shape(self.cpi)[:1], (1,))
+        # Amounts keep their dtype, so loans made from integer amounts report integer amounts
+        self.amount = np.broadcast_to(np.asarray(amount), num_loans)
+        self.num_of_months, self.grace_period = (np.broadcast_to(np.asarray(values, dtype=float), num_loans) for values
+                                                 in (num_of_months, grace_period))
+        self.num_of_months = self.num_of_months.astype(int)
+        self.grace_period = self.grace_period.astype(int)
+
+        (self.monthly_payment, self.principal_payment, self.inflation_payment, self.interest_payment,
+         self.remaining_balance) = amortize_batch(self.amount, self.num_of_months, self.interest_rate,
+                                                  self.grace_period, self.cpi)
+
+    def __len__(self):
+        return len(self.amount)
+
+    def schedule(self, index) -> LoanSchedule:
+        length = max(self.num_of_months[index], self.grace_period[index])
+        if self.num_of_months[index] == 0:
+            return LoanSchedule.empty()
+        return LoanSchedule(*(column[index, :length] for column in
+                              (self.monthly_payment, self.principal_payment, self.inflation_payment,
+                               self.interest_payment, self.remaining_balance)))
+
+    def loans(self, loan_types=None):
+        """
+        Loan objects for the rows of a batch with constant rates. Every loan starts with its row of the batch as its
+        schedule instead of amortizing again; loan_types is one type per loan (LoanType by default).
+        """
+        if self.interest_rate.ndim > 1 or self.cpi.ndim > 1:
+            raise ValueError("Only a batch with one interest rate and CPI per loan converts to Loan objects")
+        loan_types = [LoanType] * len(self) if loan_types is None else list(loan_types)
+        interest_rate, cpi = (np.broadcast_to(values, (len(self),)) for values in (self.interest_rate, self.cpi))
+        loans = []
+        for i in range(len(self)):
+            loan = Loan(self.amount[i].item(), self.num_of_months[i].item(), interest_rate[i].item(), loan_types[i],
+                        self.grace_period[i].item(), cpi[i].item())
+            loan._schedule = self.schedule(i)
+            loans.append(loan)
+        return loans
+
+    def total_payments(self):
+        return self.monthly_payment.sum(axis=1)
+
+    def total_interest_payments(self):
+        return self.interest_payment.sum(axis=1)
+
+    def total_inflation_payments(self):
+        return self.inflation_payment.sum(axis=1)
+
+    def cost_per_currency(self):
+        return np.divide(self.total_payments(), self.amount, out=np.zeros(len(self)), where=self.amount > 0)
+
+    def get_irr(self):
+        cashflows = np.column_stack([-self.amount, self.monthly_payment])
+        initial_rate, initial_cpi = (np.broadcast_to(values if values.ndim < 2 else values[:, 0], (len(self),)) for
+                                     values in (self.interest_rate, self.cpi))
+        return irr_batch(cashflows, guess=(initial_rate + initial_cpi) / 12 / 100)*12*100
+
+
 class Loan:
-    def __init__(self, amount, num_of_months, interest_rate, loan_type=LoanType, grace_period=0, cpi=CPI):
+    def __init__(self, amount, num_of_months, interest_rate, loan_type=LoanType, grace_period=0, cpi=CPI,
+                 rate_path=None, cpi_path=None, compact=False, keep_columns=None):
         # assert grace_period < num_of_months
         self.loan_type = loan_type
         self.amount = amount
@@ -21,8 +214,49 @@ class Loan:
         self.interest_rate = interest_rate
         self.grace_period = grace_period
         self.cpi = cpi
+        # Optional per-month annual rate / CPI paths (e.g. Prime or Mishtana loans), indexed by loan month. A loan
+        # follows one path, matrices of scenarios go to simulate
+        self.rate_path = Loan._freeze_path(rate_path)
+        self.cpi_path = Loan._freeze_path(cpi_path)
+        # Opt-in compact schedules for batch runs: float32 storage and/or only the listed schedule columns
+        self.compact = compact
+        self.keep_columns = keep_columns
+
+        self._schedule = None
+        self._summary = None
+
+    @property
+    def schedule(self) -> LoanSchedule:
+        # The schedule is built on first read and dropped by every setter, so a chain of changes costs one rebuild.
+        if self._schedule is None:
+            self._schedule = self.generate_amortization_schedule()
+        return self._schedule
+
+    def invalidate_schedule(self):
+        self._schedule = None
+        self._summary = None
+
+    def summary(self) -> LoanSummary:
+        "Headline figures of the loan, computed once per schedule."
+        if self._summary is None:
+            payments = self.schedule['Monthly Payment']
+            self._summary = LoanSummary(self.loan_type, self.loan_amount(), self.num_of_months(), self.interest_rate,
+                                        self.cpi, self.grace_period, self.monthly_payment(0), payments.mean(),
+                                        np.max(payments), self.total_interest_payments(),
+                                        self.schedule.total('Inflation Payment'), self.total_payments(),
+                                        self.cost_per_currency(), self.get_volatility())
+        return self._summary
+
+    def clone(self):
+        """
+        Copy-on-write copy of the loan: the clone shares the read-only schedule (and rate/CPI paths) with this loan
+        until either of them changes, since every setter drops the schedule instead of editing it.
+        """
+        return copy.copy(self)
 
-        self.amortization_schedule = self.generate_amortization_schedule()
+    @property
+    def amortization_schedule(self) -> pd.DataFrame:
+        return self.schedule.to_dataframe()
 
     def display_loan_info(self):
         print("Loan Type: {}".format(self.loan_type))
@@ -32,57 +266,47 @@ class Loan:
         print("Grace Period: {} months".format(self.grace_period))
 
     def generate_amortization_schedule(self):
-        r = (self.interest_rate / 12) / 100
-        monthly_cpi = 1 + (self.cpi / 12) / 100
-        remaining_balance = self.loan_amount()
-        amortization_schedule = []
-
         if self._num_of_months == 0:
-            amortization_schedule = {
-                'Month': 1,
-                'Monthly Payment': 0,  # Monthly payment is 0 during grace period
-                'Principal Payment': 0,
-                'Interest Payment': 0,
-                'Inflation Payment':0,
-                'Remaining Balance': 0
-            }
-            return pd.DataFrame([amortization_schedule])
-
-        for month in range(1, self.grace_period + 1):
-            remaining_balance = remaining_balance #* monthly_cpi
-            inflation_part = 0 #remaining_balance * (1 - 1 / monthly_cpi)
-            interest_payment = 0 # remaining_balance * r
-            remaining_balance = remaining_balance + interest_payment
-
-            amortization_schedule.append({
-                'Month': month,
-                'Monthly Payment': 0,  # Monthly payment is 0 during grace period
-                'Principal Payment': 0,
-                'Inflation Payment': inflation_part,
-                'Interest Payment': interest_payment,
-                'Remaining Balance': remaining_balance
-            })
-
-        n = self._num_of_months - self.grace_period
-
-        for month in range(self.grace_period + 1, n + self.grace_period + 1):
-            remaining_balance = remaining_balance * monthly_cpi
-            monthly_payment = -npf.pmt(r, self.num_of_months() - month + 1, remaining_balance)
-            inflation_part = remaining_balance * (1 - 1 / monthly_cpi)
-            interest_payment = remaining_balance * r
-            principal_payment = monthly_payment - interest_payment
-            remaining_balance -= principal_payment
-
-            amortization_schedule.append({
-                'Month': month,
-                'Monthly Payment': monthly_payment,
-                'Principal Payment': principal_payment,
-                'Inflation Payment': inflation_part,
-                'Interest Payment': interest_payment,
-                'Remaining Balance': remaining_balance
-            })
-
-        return pd.DataFrame(amortization_schedule)
+            return self._make_schedule(np.zeros((5, 1)))
+
+        if self.rate_path is not None or self.cpi_path is not None:
+            columns = amortize_paths(self.loan_amount(), self._num_of_months, self._rate_paths(), self.grace_period,
+                                     self._cpi_paths())
+            return self._make_schedule([column[0] for column in columns])
+
+        unit_columns = unit_amortization(int(self._num_of_months), float(self.interest_rate), int(self.grace_period),
+                                         float(self.cpi))
+        return self._make_schedule([self.loan_amount() * column for column in unit_columns])
+
+    def _make_schedule(self, columns):
+        if self.keep_columns is not None:
+            columns = [column if name in self.keep_columns else None for name, column in zip(LoanSchedule.fields, columns)]
+        return LoanSchedule(*columns, dtype=np.float32 if self.compact else np.float64)
+
+    def simulate(self, rate_paths=None, cpi_paths=None):
+        """
+        Schedules of this loan under many scenarios: rate_paths and cpi_paths are (paths, months) matrices of annual
+        rates. Returns a LoanBatch with one row per path; all paths are re-amortized in one vectorized computation.
+        """
+        rate_paths = self._rate_paths() if rate_paths is None else np.atleast_2d(rate_paths)
+        cpi_paths = self._cpi_paths() if cpi_paths is None else np.atleast_2d(cpi_paths)
+        return LoanBatch(self.loan_amount(), self._num_of_months, rate_paths, self.grace_period, cpi_paths)
+
+    def _rate_paths(self):
+        return np.atleast_2d(self.interest_rate if self.rate_path is None else self.rate_path)
+
+    def _cpi_paths(self):
+        return np.atleast_2d(self.cpi if self.cpi_path is None else self.cpi_path)
+
+    @staticmethod
+    def _freeze_path(path):
+        if path is None:
+            return None
+        path = np.array(path, dtype=float)
+        if path.ndim > 1:
+            raise ValueError("A loan follows a single rate or CPI path, pass a matrix of paths to Loan.simulate")
+        path.flags.writeable = False
+        return path
 
     def loan_amount(self):
         return self.amount
@@ -101,43 +325,38 @@ class Loan:
     def set_period(self, num_of_months):
         assert num_of_months >= 0
         self._num_of_months = num_of_months
-        self.amortization_schedule = self.generate_amortization_schedule()
+        self.invalidate_schedule()
 
     def set_amount(self, amount):
         self.amount = amount
         if amount == 0:
             self.set_period(0)
-        self.amortization_schedule = self.generate_amortization_schedule()
+        self.invalidate_schedule()
 
     def get_irr(self):
-        return npf.irr([-self.loan_amount()]+self.amortization_schedule['Monthly Payment'].tolist())*12*100
+        return irr(np.concatenate([[-self.loan_amount()], self.schedule['Monthly Payment']]),
+                   guess=(self.interest_rate + self.cpi) / 12 / 100)*12*100
 
     def monthly_payment(self, month):
-        if month < 0 or month > self.num_of_months():
+        if month < 0 or month > self.num_of_months() or month >= len(self.schedule):
             return 0
         else:
-            return self.amortization_schedule.at[month, 'Monthly Payment']
+            return self.schedule['Monthly Payment'][month]
 
     def average_monthly_payment(self):
-        return self.amortization_schedule['Monthly Payment'].mean()
+        return self.schedule['Monthly Payment'].mean()
 
     def highest_monthly_payment(self):
-        return np.max(self.amortization_schedule["Monthly Payment"])
+        return np.max(self.schedule['Monthly Payment'])
 
     def total_interest_payments(self, months=None):
-        if months is not None:
-            return self.amortization_schedule.loc[:months, 'Interest Payment'].sum()
-        else:
-            return self.amortization_schedule['Interest Payment'].sum()
+        return self.schedule.total('Interest Payment', months)
 
     def total_payments(self, months=None):
-        if months is not None:
-            return self.amortization_schedule.loc[:months, 'Monthly Payment'].sum()
-        else:
-            return self.amortization_schedule['Monthly Payment'].sum()
+        return self.schedule.total('Monthly Payment', months)
 
     def remaining_balance(self, months):
-        return self.amortization_schedule.loc[months, 'Remaining Balance'] if months < self.num_of_months() else 0
+        return self.schedule['Remaining Balance'][months] if months < self.num_of_months() else 0
 
     def cost_per_currency(self):
         if self.loan_amount() > 0:
@@ -149,64 +368,74 @@ class Loan:
         if extra_payment < 0:
             raise ValueError("Extra payment should be non-negative.")
         previous_amount = self.loan_amount()
-        previous_monthly_payment = self.monthly_payment(0)
+        previous_monthly_payment = self.monthly_payment(self.grace_period)
+        # The new balance is rounded, so the float noise of a summed extra payment neither leaves a residue of a repaid
+        # loan nor shifts the balance that remains
+        new_loan_amount = round(self.loan_amount() - extra_payment, BalanceDecimals)
         # if the extra payment is larger than the loan, return the remainder of the extra payment
-        if extra_payment >= self.loan_amount():
+        if new_loan_amount <= 0:
             self.set_amount(0)
-            self.amortization_schedule = self.generate_amortization_schedule()
             return extra_payment - previous_amount
         else:
-            new_loan_amount = self.loan_amount() - extra_payment
             self.set_amount(new_loan_amount)
-            if change.lower() == 'period':
+            # A loan without an amortization phase (all grace) has no payment to keep, its period stays
+            if change.lower() == 'period' and previous_monthly_payment > 0:
                 new_period = Loan.calculate_loan_period(self.loan_amount(), self.interest_rate,
-                                                        monthly_payment=previous_monthly_payment)
+                                                        monthly_payment=previous_monthly_payment, cpi=self.cpi,
+                                                        grace_period=self.grace_period,
+                                                        current_period=self.num_of_months())
                 self.set_period(new_period)
 
             return 0
 
     def change_first_payment(self, monthly_payment_amount):
         new_period = Loan.calculate_loan_period(self.loan_amount(), self.interest_rate,
-                                                self.monthly_payment(0) + monthly_payment_amount)
+                                                self.monthly_payment(self.grace_period) + monthly_payment_amount,
+                                                cpi=self.cpi, grace_period=self.grace_period,
+                                                current_period=self.num_of_months())
         self.set_period(new_period)
-        self.amortization_schedule = self.generate_amortization_schedule()
 
     def is_empty(self):
         return True if len(self.loans) < 1 else False
 
     @staticmethod
-    def calculate_loan_period(amount, interest_rate, monthly_payment):
+    def calculate_loan_period(amount, interest_rate, monthly_payment, cpi=0, grace_period=0, current_period=0):
         """
         loan_period: The number of periods (months) required to repay the loan.
         """
-
-        # Convert annual interest rate to monthly interest rate
-        monthly_interest_rate = (interest_rate / 100) / 12
-
-        # Calculate the number of payment periods using the formula
-        n = -np.log(1 - (amount * monthly_interest_rate) / monthly_payment) / np.log(1 + monthly_interest_rate)
-
-        # Round up to the nearest whole number since the number of months must be an integer
-        n = np.ceil(n)
-
-        return int(n)
+        return int(Loan.calculate_loan_periods(amount, interest_rate, monthly_payment, cpi, grace_period,
+                                               current_period=current_period)[0])
 
     @staticmethod
-    def min_monthly_increase(loan):
-        "Return the monthly amount payment increase that will change the period."
-        r = (loan.interest_rate / 12) / 100
-        monthly_payment = -npf.pmt(r, loan.num_of_months()-1, loan.loan_amount())
-        return monthly_payment
+    def calculate_loan_periods(amount, interest_rate, monthly_payment, cpi=0, grace_period=0, max_months=MaxLoanMonths,
+                               current_period=0):
+        """
+        Vectorized loan period solver: the shortest total period (grace included) whose first amortizing payment,
+        indexed by CPI like the schedule itself, does not exceed monthly_payment. All arguments broadcast.
+        Loans whose payment does not cover the indexed interest get the longer of max_months and their current_period
+        instead of NaN, and repaid loans get 0.
+        """
+        amount, interest_rate, monthly_payment, cpi, grace_period, current_period = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(values, dtype=float)) for values in
+              (amount, interest_rate, monthly_payment, cpi, grace_period, current_period)))
+        r = (interest_rate / 100) / 12
+        indexed_amount = amount * (1 + (cpi / 12) / 100)
+        payment = np.where(monthly_payment > 0, monthly_payment, np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coverage = indexed_amount * r / payment
+            n = np.where(r == 0, indexed_amount / payment,
+                         -np.log1p(-coverage) / np.log1p(np.where(r == 0, 1, r)))
+        # Round up to a whole month, ignoring float noise of payments that were computed for an exact period
+        n = np.ceil(n - 1e-9)
+
+        uncovered = np.maximum(np.maximum(max_months, current_period) - grace_period, 1)
+        periods = grace_period + np.where(np.isnan(n) | (coverage >= 1), uncovered, np.maximum(n, 1))
+        return np.where(amount > 0, periods, 0).astype(int)
 
     @staticmethod
     def get_yearly_amortization(amortization_schedule):
-        yearly_amortization = amortization_schedule.groupby(amortization_schedule.index // 12).agg({
-            'Month': 'last',
-            'Monthly Payment': 'sum',
-            'Principal Payment': 'sum',
-            'Inflation Payment': 'sum',
-            'Interest Payment': 'sum',
-            'Remaining Balance': 'last'  # Take the last value for Remaining Balance
-        }).astype({'Month': int, 'Principal Payment': int, 'Inflation Payment':int, 'Interest Payment': int, 'Monthly Payment': int,
-                   'Remaining Balance': int})
-        return yearly_amortization
\ No newline at end of file
+        if isinstance(amortization_schedule, LoanSchedule):
+            return amortization_schedule.yearly()
+        columns = {name: amortization_schedule[name].to_numpy() for name in YEARLY_AGGREGATIONS}
+        return pd.DataFrame(yearly_rollup(columns, YEARLY_AGGREGATIONS)).astype(int)
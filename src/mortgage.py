@@ -1,47 +1,93 @@
 import copy
 import numpy as np
-import numpy_financial as npf
 import pandas as pd
 import tabulate
-from loan import Loan
+from loan import Loan, LoanBatch
+from schedule import LoanSchedule
+from summary import MortgageSummary
+from irr import irr
+from storage import engine_hash, save_arrays, load_arrays, encode_loan_type, decode_loan_type
+from recycle import allocate_lump_sum, allocate_monthly_budget, allocate_monthly_reduction, optimal_lump_sum, \
+    optimal_monthly_budget, round_to_hull_vertices, sweep_lump_sums
 from constants import *
 
 
 class Mortgage:
-    def __init__(self, loans, name="Mortgage"):
+    def __init__(self, loans, name="Mortgage", compact=False, keep_columns=None):
         self.loans = loans
         self.name = name
-        self.amortization_schedule = self.generate_amortization_schedule()
+        # Opt-in compact aggregate schedule for batch runs, see LoanSchedule.compact
+        self.compact = compact
+        self.keep_columns = keep_columns
+        self.schedule = self.generate_amortization_schedule()
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        # The name is part of the cached summary
+        self._name = name
+        self._summary = None
+
+    @property
+    def schedule(self) -> LoanSchedule:
+        return self._schedule
+
+    @schedule.setter
+    def schedule(self, schedule):
+        # Every change of the mortgage ends by assigning its new schedule, which drops the cached summary
+        self._schedule = schedule
+        self._summary = None
+
+    @property
+    def amortization_schedule(self) -> pd.DataFrame:
+        return self.schedule.to_dataframe()
+
+    def summary(self) -> MortgageSummary:
+        "Headline figures of the mortgage and its loans, computed once per schedule."
+        if self._summary is None:
+            loans = tuple(loan.summary() for loan in self.loans)
+            amount = sum(loan.amount for loan in loans)
+            fully_repaid = len(loans) < 1 or amount < 1
+            num_of_months = 0 if fully_repaid else max(loan.num_of_months for loan in loans if loan.amount > 0)
+            payments = self.schedule['Monthly Payment']
+            total_payments = self.schedule.total('Monthly Payment')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                volatility = np.divide(sum(loan.amount * loan.volatility for loan in loans), amount) if loans else 0
+            self._summary = MortgageSummary(
+                name=self.name,
+                amount=amount,
+                num_of_months=num_of_months,
+                average_interest_rate=sum(loan.amount * loan.interest_rate for loan in loans) / amount
+                if amount > 0 else 0,
+                cpi_bound_amount=sum(loan.amount * (loan.cpi > 0) for loan in loans),
+                first_payment=payments[0] if num_of_months > 0 else 0,
+                average_monthly_payment=np.mean(payments),
+                highest_monthly_payment=np.max(payments),
+                total_interest=self.schedule.total('Interest Payment'),
+                total_inflation=self.schedule.total('Inflation Payment'),
+                total_payments=total_payments,
+                cost=total_payments - amount,
+                cost_per_currency=np.divide(total_payments, amount) if amount > 0 else np.nan,
+                irr=self.get_irr(),
+                volatility=volatility,
+                loans=loans)
+        return self._summary
 
     def get_mortgage_info(self):
-        loan_details = []
-
-        for i, loan in enumerate(self.loans, start=1):
-            # Calculate additional information
-            total_loan_amount = loan.total_payments()
-            interest_per_dollar = loan.cost_per_currency()
-
-            # Append details to the list
-            loan_details.append([
-                loan.loan_type,
-                loan.loan_amount(),
-                loan.num_of_months(),
-                loan.interest_rate,
-                loan.cpi,
-                loan.grace_period,
-                loan.average_monthly_payment(),
-                loan.monthly_payment(0),
-                loan.total_interest_payments(),
-                total_loan_amount,
-                interest_per_dollar
-            ])
+        summary = self.summary()
+        loan_details = [[loan.loan_type, loan.amount, loan.num_of_months, loan.interest_rate, loan.cpi,
+                         loan.grace_period, loan.average_monthly_payment, loan.first_payment, loan.total_interest,
+                         loan.total_payments, loan.cost_per_currency] for loan in summary.loans]
 
         loan_details.append([
-            'Total Mortgage', self.loan_amount(),
-            self.num_of_months(),
-            self.average_interest_rate(), '', '', self.average_monthly_payment(), self.monthly_payment(0),
-            self.total_interest_payments(), self.total_payments(),
-            self.cost_per_currency()
+            'Total Mortgage', summary.amount,
+            summary.num_of_months,
+            summary.average_interest_rate, '', '', summary.average_monthly_payment, summary.first_payment,
+            summary.total_interest, summary.total_payments,
+            summary.cost_per_currency
         ])
 
         headers = ["Loan Type", "Loan Amount", "Number of Months", "Interest Rate", "CPI",
@@ -50,39 +96,35 @@ class Mortgage:
         df = pd.DataFrame(loan_details, columns=headers)
         return df
 
-    def display_mortgage_info(self):
-        # Initialize a list to store the loan details
+    def display_mortgage_info(self, verbose=False):
+        # The formatted table of the loans, printed as well when verbose
+        summary = self.summary()
         loan_details = []
 
-        for i, loan in enumerate(self.loans, start=1):
-            # Calculate additional information
-            total_loan_amount = loan.total_payments()
-            cost_per_currency = loan.cost_per_currency()
-
-            # Append details to the list
+        for i, loan in enumerate(summary.loans, start=1):
             loan_details.append([
                 f'({i})',
                 loan.loan_type,
                 "{:,.0f}".format(loan.amount),
-                f'{loan._num_of_months} ({np.round(loan._num_of_months / 12, 1)} y)',
-                "{:,.0f}%".format(loan.loan_amount()/self.loan_amount()*100),
+                f'{loan.num_of_months} ({np.round(loan.num_of_months / 12, 1)} y)',
+                "{:,.0f}%".format(loan.amount/summary.amount*100),
                 "{}%".format(loan.interest_rate),
                 "{}%".format(loan.cpi),
                 loan.grace_period,
-                "{:,.0f}".format(loan.average_monthly_payment()),
-                "{:,.0f}".format(loan.monthly_payment(0)),
-                "{:,.0f}".format(loan.total_interest_payments()),
-                "{:,.0f}".format(total_loan_amount),
-                "{:,.2f}".format(cost_per_currency)
+                "{:,.0f}".format(loan.average_monthly_payment),
+                "{:,.0f}".format(loan.first_payment),
+                "{:,.0f}".format(loan.total_interest),
+                "{:,.0f}".format(loan.total_payments),
+                "{:,.2f}".format(loan.cost_per_currency)
             ])
 
         loan_details.append([
-            'Total', 'Mortgage', "{:,.0f}".format(self.loan_amount()),
-            f'{self.num_of_months()} ({np.round(self.num_of_months() / 12, 1)} y)', '',
-            "{:,.2f}%".format(self.average_interest_rate()), '', '', "{:,.0f}".format(self.average_monthly_payment()),
-            "{:,.0f}".format(self.monthly_payment(0)),
-            "{:,.0f}".format(self.total_interest_payments()), "{:,.0f}".format(self.total_payments()),
-            "{:,.2f}".format(self.cost_per_currency())
+            'Total', 'Mortgage', "{:,.0f}".format(summary.amount),
+            f'{summary.num_of_months} ({np.round(summary.num_of_months / 12, 1)} y)', '',
+            "{:,.2f}%".format(summary.average_interest_rate), '', '', "{:,.0f}".format(summary.average_monthly_payment),
+            "{:,.0f}".format(summary.first_payment),
+            "{:,.0f}".format(summary.total_interest), "{:,.0f}".format(summary.total_payments),
+            "{:,.2f}".format(summary.cost_per_currency)
         ])
 
         # Define column headers
@@ -92,60 +134,81 @@ class Mortgage:
 
         df = pd.DataFrame(loan_details, columns=headers)
 
-        # Print the tabulated information
-        print("\nMortgage Details:")
-        print(tabulate.tabulate(loan_details, headers=headers, tablefmt="pretty"))
+        if verbose:
+            print("\nMortgage Details:")
+            print(tabulate.tabulate(loan_details, headers=headers, tablefmt="pretty"))
 
         return df
 
     def generate_amortization_schedule(self):
-        # Determine the maximum number of months across all loans
-
+        # Rebuilds the aggregate arrays from every loan, later single-loan changes patch them in place (_update_loan)
+        # Only the columns kept by every loan can be aggregated
+        self._columns = [column for column in LoanSchedule.fields if
+                         all(column in loan.schedule.columns() for loan in self.loans)]
+        max_months = max((loan._num_of_months for loan in self.loans), default=0)
+
+        # Stack every loan's columns, zero padded to the longest term, and sum along the loan axis at once
+        self._totals = Mortgage.stack_loan_columns(self.loans, self._columns, max_months).sum(axis=1)
+        return self._schedule_from_totals()
+
+    def clone(self, name=None):
+        """
+        Cheap copy of the mortgage for what-if changes: the loans are copy-on-write clones and the aggregate schedule,
+        which is read-only, is shared rather than recomputed. Only the running totals patched by _update_loan are copied.
+        """
+        clone = copy.copy(self)
+        clone.loans = [loan.clone() for loan in self.loans]
+        clone._columns = list(self._columns)
+        clone._totals = self._totals.copy()
+        if name is not None:
+            clone.name = name
+        return clone
+
+    def _schedule_from_totals(self):
         if self.is_fully_repaid():
-            return pd.DataFrame([{
-                'Month': 0,
-                'Monthly Payment': 0,
-                'Principal Payment': 0,
-                'Interest Payment': 0,
-                'Inflation Payment': 0,
-                'Remaining Balance': 0
-            }])
-
-        max_months = max(loan._num_of_months for loan in self.loans)
-
-        amortization_schedule = []
-
-        # Iterate for each month
-        for month in range(1, max_months + 1):
-            # Initialize totals for the month
-            total_principal_payment = 0
-            total_interest_payment = 0
-            total_monthly_payment = 0
-            total_remaining_balance = 0
-            total_inflation_payment= 0
-
-            # Iterate through each loan
-            for i, loan in enumerate(self.loans, start=1):
-                if month <= loan._num_of_months:
-                    total_principal_payment += loan.amortization_schedule.at[month - 1, 'Principal Payment']
-                    total_inflation_payment += loan.amortization_schedule.at[month - 1, 'Inflation Payment']
-                    total_interest_payment += loan.amortization_schedule.at[month - 1, 'Interest Payment']
-                    total_monthly_payment += loan.amortization_schedule.at[month - 1, 'Monthly Payment']
-                    total_remaining_balance += loan.amortization_schedule.at[month - 1, 'Remaining Balance']
-
-            # Append totals to the dictionary
-            amortization_schedule.append({
-                'Month': month,
-                'Monthly Payment': total_monthly_payment,
-                'Principal Payment': total_principal_payment,
-                'Inflation Payment': total_inflation_payment,
-                'Interest Payment': total_interest_payment,
-                'Remaining Balance': total_remaining_balance
-            })
-
-        mortgage_amortization = pd.DataFrame(amortization_schedule)
-
-        return mortgage_amortization
+            return self._make_schedule(LoanSchedule.empty())
+        totals = dict(zip(self._columns, self._totals))
+        return self._make_schedule(LoanSchedule(*(totals.get(column) for column in LoanSchedule.fields)))
+
+    @staticmethod
+    def stack_loan_columns(loans, columns, max_months):
+        "A (columns, loans, months) array of the loans' schedules, each cut at its own term and zero padded."
+        stacked = np.zeros((len(columns), len(loans), max_months))
+        for i, loan in enumerate(loans):
+            months = min(loan._num_of_months, len(loan.schedule), max_months)
+            for c, column in enumerate(columns):
+                stacked[c, i, :months] = loan.schedule[column][:months]
+        return stacked
+
+    def _update_loan(self, loan, update):
+        """
+        Applies update(loan) to one of the mortgage loans and patches the aggregate schedule with that loan's delta:
+        its old schedule is subtracted, the new one added and the arrays resized to the new longest term.
+        Costs O(months) instead of re-summing all the loans. Returns what update returned.
+        """
+        self._add_loan_columns(loan, -1)
+        result = update(loan)
+        self._add_loan_columns(loan, 1)
+        max_months = max((loan._num_of_months for loan in self.loans), default=0)
+        self._totals = self._totals[:, :max_months]
+        self.schedule = self._schedule_from_totals()
+        return result
+
+    def _add_loan_columns(self, loan, sign):
+        months = min(loan._num_of_months, len(loan.schedule))
+        if months > self._totals.shape[1]:
+            self._totals = np.pad(self._totals, ((0, 0), (0, months - self._totals.shape[1])))
+        for c, column in enumerate(self._columns):
+            self._totals[c, :months] += sign * loan.schedule[column][:months]
+
+    def _make_schedule(self, schedule):
+        if self.compact or self.keep_columns is not None:
+            return schedule.compact(self.keep_columns, np.float32 if self.compact else np.float64)
+        return schedule
+
+    def schedule_nbytes(self):
+        "Memory held by the aggregate schedule and the schedules of all loans, their caches included."
+        return self.schedule.nbytes + sum(loan.schedule.nbytes for loan in self.loans)
 
     def num_of_months(self):
         return max(loan.num_of_months() for loan in self.loans if loan.loan_amount() > 0) if not self.is_fully_repaid() else 0
@@ -161,15 +224,15 @@ class Mortgage:
 
     def monthly_payment(self, month):
         if month >= 0 and month < self.num_of_months():
-            return self.amortization_schedule.loc[month, 'Monthly Payment'].sum()
+            return self.schedule['Monthly Payment'][month]
         else:
             return 0
 
     def average_monthly_payment(self):
-        return np.mean(self.amortization_schedule["Monthly Payment"])
+        return np.mean(self.schedule['Monthly Payment'])
 
     def highest_monthly_payment(self):
-        return np.max(self.amortization_schedule["Monthly Payment"])
+        return np.max(self.schedule['Monthly Payment'])
 
     def cost_per_currency(self):
         if self.loan_amount() >= 0:
@@ -183,57 +246,48 @@ class Mortgage:
         return weighted_average_interest_rate
 
     def total_interest_payments(self, month=None):
-        if month is not None:
-            return self.amortization_schedule.loc[:month, 'Interest Payment'].sum()
-        else:
-            return self.amortization_schedule['Interest Payment'].sum()
+        return self.schedule.total('Interest Payment', month)
 
     def total_inflation_payments(self, month=None):
-        if month is not None:
-            return self.amortization_schedule.loc[:month, 'Inflation Payment'].sum()
-        else:
-            return self.amortization_schedule['Inflation Payment'].sum()
+        return self.schedule.total('Inflation Payment', month)
 
     def get_irr(self):
-        return npf.irr([-self.loan_amount()]+self.amortization_schedule['Monthly Payment'].tolist())*12*100
+        return irr(np.concatenate([[-self.loan_amount()], self.schedule['Monthly Payment']]),
+                   guess=self.average_interest_rate() / 12 / 100)*12*100
 
     def interest_payment(self, month):
-        return 0 if month >= self.num_of_months() else self.amortization_schedule.loc[month, 'Interest Payment']
+        return 0 if month >= self.num_of_months() else self.schedule['Interest Payment'][month]
 
     def inflation_payment(self, month):
-        return 0 if month >= self.num_of_months() else self.amortization_schedule.loc[month, 'Inflation Payment']
+        return 0 if month >= self.num_of_months() else self.schedule['Inflation Payment'][month]
 
     def total_principal_payments(self, months=None):
-        if months is not None and months < self.num_of_months():
-            return self.amortization_schedule.loc[:months, 'Principal Payment'].sum()
-        else:
-            return self.amortization_schedule['Principal Payment'].sum()
+        return self.schedule.total('Principal Payment', months)
 
     def total_payments(self, months=None):
-        if months is not None:
-            return self.amortization_schedule.loc[:months, 'Monthly Payment'].sum()
-        else:
-            return self.amortization_schedule['Monthly Payment'].sum()
+        return self.schedule.total('Monthly Payment', months)
 
     def cost(self):
         return self.total_payments() - self.loan_amount()
 
     def remaining_balance(self, months):
-        return self.amortization_schedule.loc[months, 'Remaining Balance'] if months < self.num_of_months() else 0
+        return self.schedule['Remaining Balance'][months] if months < self.num_of_months() else 0
 
     def add_loan(self, loan):
         self.loans.append(loan)
-        self.amortization_schedule = self.generate_amortization_schedule()
+        if all(column in loan.schedule.columns() for column in self._columns):
+            self._add_loan_columns(loan, 1)
+            self.schedule = self._schedule_from_totals()
+        else:
+            self.schedule = self.generate_amortization_schedule()
 
     def payback_loan(self, loan_index, amount, change='payment'):
-        remaining = self.loans[loan_index].apply_extra_payment(amount, change)
-        self.amortization_schedule = self.generate_amortization_schedule()
-        return remaining
+        return self._update_loan(self.loans[loan_index], lambda loan: loan.apply_extra_payment(amount, change))
 
     def change_loan_first_payment(self, loan_index, monthly_payment_amount):
         target_loan: Loan = self.loans[loan_index]
-        target_loan.change_first_payment(target_loan.monthly_payment(0) + monthly_payment_amount)
-        self.amortization_schedule = self.generate_amortization_schedule()
+        self._update_loan(target_loan,
+                          lambda loan: loan.change_first_payment(loan.monthly_payment(0) + monthly_payment_amount))
 
     def is_empty(self):
         return len(self.loans) < 1
@@ -258,21 +312,34 @@ class Mortgage:
 
     @staticmethod
     def from_dataframe(df: pd.DataFrame, cpi=CPI, name=None):
-        loans = []
-        for i, row in df.iterrows():  # Use df.iterrows() to iterate through rows
-            cpi_actual = cpi if (isinstance(row['cpi'], str) and row['cpi'].lower() in ['yes', 'true']) or \
-                                (isinstance(row['cpi'], bool) and bool(row['cpi'])) else 0
-
-            loan = Loan(row['amount'],
-                        int(row['num_of_months']),
-                        row['interest_rate'],
-                        row['loan_type'],
-                        int(row['grace_period']),
-                        cpi_actual)
-            loans.append(loan)
+        """
+        Builds the mortgage from a loans frame (see columns_types) column by column: the terms are parsed and validated
+        as whole columns (parse_dataframe) and all the loans are amortized together by a LoanBatch.
+        """
+        terms = Mortgage.parse_dataframe(df, cpi)
+        batch = LoanBatch(terms['amount'], terms['num_of_months'], terms['interest_rate'], terms['grace_period'],
+                          terms['cpi'])
+        loans = batch.loans(terms['loan_type'])
 
         return Mortgage(loans, name=name) if name else Mortgage(loans)
 
+    @staticmethod
+    def parse_dataframe(df: pd.DataFrame, cpi=CPI):
+        """
+        The loan terms of a loans frame as arrays, parsed and validated as whole columns. 'cpi' is normalized from
+        'yes'/'true' strings or booleans to the given CPI or 0 in one step.
+        """
+        terms = df[['amount', 'num_of_months', 'interest_rate', 'grace_period']].apply(pd.to_numeric, errors='coerce')
+        invalid = terms.isna().any(axis=1)
+        if invalid.any():
+            raise ValueError(f"Loans {list(df.index[invalid])} have missing or non-numeric terms")
+        cpi_linked = df['cpi'].astype(str).str.strip().str.lower().isin(['yes', 'true']).to_numpy()
+
+        return {'amount': terms['amount'].to_numpy(), 'num_of_months': terms['num_of_months'].to_numpy(int),
+                'interest_rate': terms['interest_rate'].to_numpy(float),
+                'grace_period': terms['grace_period'].to_numpy(int), 'cpi': np.where(cpi_linked, cpi, 0),
+                'loan_type': df['loan_type'].to_numpy(object)}
+
     @staticmethod
     def columns_types():
         return {
@@ -285,145 +352,253 @@ class Mortgage:
         }
 
     def to_dataframe(self) -> pd.DataFrame:
-        # Create a list of dictionaries to store loan information
-        loans_data = []
-        for loan in self.loans:
-            loans_data.append({
-                'amount': loan.loan_amount(),
-                'num_of_months': loan.num_of_months(),
-                'interest_rate': loan.average_interest_rate(),
-                'loan_type': loan.loan_type,
-                'grace_period': loan.grace_period,
-                'cpi': loan.cpi > 0
-            })
-
-        # Create a DataFrame from the list of loan dictionaries
-        return pd.DataFrame(loans_data)
+        # One column at a time, the inverse of from_dataframe
+        return pd.DataFrame({
+            'amount': [loan.loan_amount() for loan in self.loans],
+            'num_of_months': [loan.num_of_months() for loan in self.loans],
+            'interest_rate': [loan.average_interest_rate() for loan in self.loans],
+            'loan_type': [loan.loan_type for loan in self.loans],
+            'grace_period': [loan.grace_period for loan in self.loans],
+            'cpi': np.array([loan.cpi for loan in self.loans], dtype=float) > 0,
+        }, columns=list(Mortgage.columns_types().keys()))
+
+    def save(self, path):
+        """
+        Writes the loan terms with the computed schedule of every loan to an .npz file, tagged with the engine hash.
+        Mortgage.load maps the schedules back instead of amortizing again.
+        """
+        if any(loan.rate_path is not None or loan.cpi_path is not None for loan in self.loans):
+            raise ValueError("Loans with rate or CPI paths can not be saved")
+        lengths = np.array([len(loan.schedule) for loan in self.loans], dtype=int)
+        columns = list(LoanSchedule.fields)
+        # Every loan keeps its own columns, the ones it does not keep are left zero
+        kept = np.array([[column in loan.schedule.columns() for column in columns] for loan in self.loans],
+                        dtype=bool).reshape(len(self.loans), len(columns))
+        dtype = np.float32 if self.loans and all(loan.compact for loan in self.loans) else np.float64
+        schedules = np.zeros((len(columns), len(self.loans), lengths.max(initial=0)), dtype=dtype)
+        for i, loan in enumerate(self.loans):
+            for c, column in enumerate(columns):
+                if kept[i, c]:
+                    schedules[c, i, :lengths[i]] = loan.schedule[column]
+        save_arrays(path, {
+            'engine': np.array(engine_hash()),
+            'name': np.array(str(self.name)),
+            'amount': np.array([loan.loan_amount() for loan in self.loans]),
+            'num_of_months': np.array([loan.num_of_months() for loan in self.loans], dtype=int),
+            'interest_rate': np.array([loan.interest_rate for loan in self.loans], dtype=float),
+            'grace_period': np.array([loan.grace_period for loan in self.loans], dtype=int),
+            'cpi': np.array([loan.cpi for loan in self.loans], dtype=float),
+            'loan_type': np.array([encode_loan_type(loan.loan_type) for loan in self.loans], dtype=str),
+            'compact': np.array([loan.compact for loan in self.loans], dtype=bool),
+            'keep_columns': np.array([Mortgage._keep_columns_mask(loan.keep_columns) for loan in self.loans],
+                                     dtype=bool).reshape(len(self.loans), len(columns)),
+            'mortgage_compact': np.array(self.compact),
+            'mortgage_keep_columns': Mortgage._keep_columns_mask(self.keep_columns),
+            'columns': np.array(columns, dtype=str),
+            'kept_columns': kept,
+            'schedule_length': lengths,
+            'schedules': schedules})
 
     @staticmethod
-    def recycle_mortgage(mortgage, extra_payment, change='payment'):
-        recycled_mortgage: Mortgage = copy.deepcopy(mortgage)
+    def load(path, mmap_mode='r'):
+        """
+        Reads a mortgage written by save. The loan schedules are read-only views of the memory mapped file; when the
+        file was written by another version of the engine they are dropped and the loans amortize again.
+        """
+        arrays = load_arrays(path, mmap_mode)
+        is_current = arrays['engine'].item() == engine_hash()
+        columns = arrays['columns'].tolist()
+        loans = []
+        for i in range(len(arrays['amount'])):
+            loan = Loan(arrays['amount'][i].item(), arrays['num_of_months'][i].item(),
+                        arrays['interest_rate'][i].item(), decode_loan_type(arrays['loan_type'][i].item()),
+                        arrays['grace_period'][i].item(), arrays['cpi'][i].item(),
+                        compact=bool(arrays['compact'][i]),
+                        keep_columns=Mortgage._keep_columns(arrays['keep_columns'][i]))
+            if is_current:
+                kept = {column: values for column, values, is_kept in
+                        zip(columns, arrays['schedules'][:, i, :arrays['schedule_length'][i]], arrays['kept_columns'][i])
+                        if is_kept}
+                loan._schedule = LoanSchedule(*(kept.get(column) for column in LoanSchedule.fields),
+                                              dtype=np.float32 if loan.compact else np.float64)
+            loans.append(loan)
+        return Mortgage(loans, name=arrays['name'].item(), compact=bool(arrays['mortgage_compact']),
+                        keep_columns=Mortgage._keep_columns(arrays['mortgage_keep_columns']))
+
+    @staticmethod
+    def _keep_columns_mask(keep_columns):
+        # keep_columns as a mask over LoanSchedule.fields, None keeps every column
+        return np.array([keep_columns is None or column in keep_columns for column in LoanSchedule.fields])
+
+    @staticmethod
+    def _keep_columns(mask):
+        # The inverse of _keep_columns_mask
+        return None if mask.all() else [column for column, keep in zip(LoanSchedule.fields, mask) if keep]
+
+    @staticmethod
+    def recycle_mortgage(mortgage, extra_payment, change='payment', exact=False):
+        """
+        Pays extra_payment off the loans with the highest cost per currency first (see recycle.allocate_lump_sum) and
+        shortens their payment or period. The allocation is computed from the loans' cost curves and the resulting
+        mortgage is built once. exact=True allocates to the currency instead of in MortgageRecycleIterationAmount steps.
+        """
+        recycled_mortgage: Mortgage = mortgage.clone(name=f"Recycled {mortgage.name}")
         if extra_payment >= mortgage.loan_amount():
             [loan.set_amount(0) for loan in recycled_mortgage.loans]
-            return Mortgage(recycled_mortgage.loans, name=f"Recycled {mortgage.name}")
+            recycled_mortgage.schedule = recycled_mortgage.generate_amortization_schedule()
+            return recycled_mortgage
         first_monthly_payment = recycled_mortgage.monthly_payment(0)
 
-        remainder = extra_payment
-        while remainder > 0:
-            cost_per_currency = [loan.cost_per_currency() for loan in recycled_mortgage.loans]
-            loan_index = cost_per_currency.index(max(cost_per_currency))
-            target_loan = recycled_mortgage.loans[loan_index]
-            loan_payback = min([MortgageRecycleIterationAmount, remainder, target_loan.loan_amount()])
-            remainder -= loan_payback
-            payback_remainder = recycled_mortgage.payback_loan(loan_index, loan_payback, change=change)
-            assert payback_remainder == 0
-            remainder += payback_remainder
-            print(f'{target_loan.loan_type} after:{remainder} paid:{loan_payback} remainder:{payback_remainder}')
+        paydowns = allocate_lump_sum(recycled_mortgage.loans, extra_payment, change=change, exact=exact)
+        for loan, paydown in zip(recycled_mortgage.loans, paydowns):
+            if paydown > 0:
+                loan.apply_extra_payment(paydown, change)
+        recycled_mortgage.schedule = recycled_mortgage.generate_amortization_schedule()
 
         if change.lower() == 'period':
             monthly_payment_remainder = first_monthly_payment - recycled_mortgage.monthly_payment(0)
 
-            recycled_mortgage = Mortgage.recycle_mortgage_monthly(recycled_mortgage, monthly_payment_remainder)
+            # Float noise of a payment that did not change must not extend a loan by a month
+            if abs(monthly_payment_remainder) > 1e-6:
+                recycled_mortgage = Mortgage.recycle_mortgage_monthly(recycled_mortgage, monthly_payment_remainder)
 
-        return Mortgage([loan for loan in recycled_mortgage.loans], name=f"Recycled {mortgage.name}")
+        return recycled_mortgage
 
     @staticmethod
-    def recycle_mortgage_monthly(mortgage, extra_payment):
+    def recycle_mortgage_monthly(mortgage, extra_payment, return_iterations=False):
+        """
+        Raises the monthly payment by up to extra_payment, shortening the loans with the highest IRR first
+        (see recycle.allocate_monthly_budget). With return_iterations=True also returns the solver iteration count.
+        """
         if extra_payment < 0:
-            return Mortgage._reduce_mortgage_monthly(mortgage, extra_payment)
+            return Mortgage._reduce_mortgage_monthly(mortgage, extra_payment, return_iterations)
 
-        recycled_mortgage: Mortgage = copy.deepcopy(mortgage)
+        recycled_mortgage: Mortgage = mortgage.clone()
+        iterations = 0
+        if extra_payment > 0 and not mortgage.is_fully_repaid():
+            months, iterations = allocate_monthly_budget(recycled_mortgage.loans, extra_payment)
+            for loan, num_of_months in zip(recycled_mortgage.loans, months):
+                if num_of_months != loan.num_of_months():
+                    loan.set_period(num_of_months)
+            recycled_mortgage.schedule = recycled_mortgage.generate_amortization_schedule()
 
-        if extra_payment == 0 or mortgage.is_fully_repaid():
-            return recycled_mortgage
-        first_monthly_payment = recycled_mortgage.monthly_payment(0)
-        monthly_payment_difference = 0
-        remainder = extra_payment
-        converged = False
-        relevant_loans = [loan for loan in recycled_mortgage.loans if
-                          loan.loan_amount() > 0 and loan.num_of_months() > 1]
-        while not converged and len(relevant_loans) > 0 and remainder > 0:
-            cost_per_currency = [loan.get_irr() for loan in relevant_loans if loan.loan_amount() > 0]
-            target_loan_index = cost_per_currency.index(max(cost_per_currency))
-            target_loan = relevant_loans[target_loan_index]
-            #the payback is the minimum between the remaider and the ...
-            loan_payback = min([remainder, Loan.min_monthly_increase(target_loan) - target_loan.monthly_payment(0)+1])
-            target_loan.change_first_payment(loan_payback)
-            recycled_mortgage.amortization_schedule = recycled_mortgage.generate_amortization_schedule()
-            remainder = extra_payment - (recycled_mortgage.monthly_payment(0) - first_monthly_payment)
-            converged = monthly_payment_difference == (recycled_mortgage.monthly_payment(0) - first_monthly_payment)
-            monthly_payment_difference = recycled_mortgage.monthly_payment(0) - first_monthly_payment
-            relevant_loans = [loan for loan in recycled_mortgage.loans if
-                              loan.loan_amount() > 0 and loan.num_of_months() > 1]
-
-        return Mortgage([loan for loan in recycled_mortgage.loans], name=recycled_mortgage.name)
+        return (recycled_mortgage, iterations) if return_iterations else recycled_mortgage
 
 
     @staticmethod
-    def _reduce_mortgage_monthly(mortgage, less_payment):
+    def _reduce_mortgage_monthly(mortgage, less_payment, return_iterations=False):
+        """
+        Lowers the monthly payment by -less_payment, extending the loans with the lowest cost per currency first
+        (see recycle.allocate_monthly_reduction). The result reduces the first month's payment by at least that much,
+        as far as the loans out of their grace period can be extended.
+        """
+        recycled_mortgage: Mortgage = mortgage.clone()
+        iterations = 0
+        if less_payment < 0 and not mortgage.is_fully_repaid():
+            months, iterations = allocate_monthly_reduction(recycled_mortgage.loans, less_payment)
+            for loan, num_of_months in zip(recycled_mortgage.loans, months):
+                if num_of_months != loan.num_of_months():
+                    loan.set_period(num_of_months)
+            recycled_mortgage.schedule = recycled_mortgage.generate_amortization_schedule()
+
+        return (recycled_mortgage, iterations) if return_iterations else recycled_mortgage
 
-        recycled_mortgage: Mortgage = copy.deepcopy(mortgage)
-        if less_payment == 0:
-            return recycled_mortgage
+    @staticmethod
+    def recycle_sweep(mortgage, extra_payments, changes=('payment', 'period'), exact=False):
+        """
+        Savings of recycle_mortgage for a whole grid of lump sums, per change strategy, in one pass per strategy
+        (see recycle.sweep_lump_sums): {change: {'Interest Savings': array, 'Indexation Savings': array,
+        'First Payment Savings': array, 'Period Savings': array}}, one value per lump sum.
+        """
+        return {change: sweep_lump_sums(mortgage.loans, extra_payments, change, exact) for change in changes}
+
+    @staticmethod
+    def optimize_recycle(mortgage, extra_payment=0, monthly_extra=0, change='payment', max_volatility=None):
+        """
+        Cost-minimizing recycle_mortgage followed by recycle_mortgage_monthly, optionally within max_volatility.
+        Returns the per-loan allocation and the resulting mortgage.
+        """
+        months_before = [loan.num_of_months() for loan in mortgage.loans]
+        first_payments = [loan.monthly_payment(0) for loan in mortgage.loans]
+
+        plans = [np.zeros(len(mortgage.loans))]
+        if extra_payment > 0:
+            paydowns = optimal_lump_sum(mortgage.loans, extra_payment, change, max_volatility)
+            plans = [round_to_hull_vertices(mortgage.loans, paydowns, change),
+                     allocate_lump_sum(mortgage.loans, extra_payment, change, exact=True)]
+            plans.insert(0, paydowns)
+        candidates = [(plan, Mortgage._apply_recycle_plan(mortgage, plan, monthly_extra, change)) for plan in plans]
+        if max_volatility is not None:
+            candidates = [(plan, recycled) for plan, recycled in candidates if
+                          recycled.get_volatility() <= max_volatility + 1e-9]
+            if not candidates:
+                raise ValueError(f"No allocation satisfies the constraints: the mortgage volatility stays above "
+                                 f"{max_volatility}")
+        paydowns, recycled_mortgage = min(candidates, key=lambda candidate: candidate[1].total_payments())
+
+        allocation = pd.DataFrame({
+            'Loan Type': [loan.loan_type for loan in recycled_mortgage.loans],
+            'Paydown': paydowns,
+            'Monthly Increase': [loan.monthly_payment(0) - payment for loan, payment in
+                                 zip(recycled_mortgage.loans, first_payments)],
+            'Months Before': months_before,
+            'Months After': [loan.num_of_months() for loan in recycled_mortgage.loans],
+        })
+        return allocation, recycled_mortgage
+
+    @staticmethod
+    def _apply_recycle_plan(mortgage, paydowns, monthly_extra, change):
+        # The mortgage after paying paydowns off its loans and spending the monthly budget, see optimize_recycle
+        recycled_mortgage: Mortgage = mortgage.clone(name=f"Optimized {mortgage.name}")
         first_monthly_payment = recycled_mortgage.monthly_payment(0)
-        monthly_payment_difference = 0
-        remainder = less_payment
-        converged = False
-
-        while not converged:
-            cost_per_currency = [loan.cost_per_currency() for loan in recycled_mortgage.loans]
-            target_loan_index = cost_per_currency.index(min(cost_per_currency))
-            target_loan = recycled_mortgage.loans[target_loan_index]
-            loan_payback = max([-50, remainder])
-            target_loan.change_first_payment(loan_payback)
-            recycled_mortgage.amortization_schedule = recycled_mortgage.generate_amortization_schedule()
-            converged = monthly_payment_difference == (recycled_mortgage.monthly_payment(0) - first_monthly_payment)
-            monthly_payment_difference = recycled_mortgage.monthly_payment(0) - first_monthly_payment
-            remainder = less_payment - monthly_payment_difference
-
-        return Mortgage([loan for loan in recycled_mortgage.loans], name=recycled_mortgage.name)
+        for loan, paydown in zip(recycled_mortgage.loans, paydowns):
+            if paydown > 0:
+                loan.apply_extra_payment(min(paydown, loan.loan_amount()), change)
+        recycled_mortgage.schedule = recycled_mortgage.generate_amortization_schedule()
+
+        budget = monthly_extra
+        if change.lower() == 'period':
+            budget += first_monthly_payment - recycled_mortgage.monthly_payment(0)
+        if abs(budget) <= 1e-6 or recycled_mortgage.is_fully_repaid():
+            return recycled_mortgage
+        if budget < 0:
+            return Mortgage._reduce_mortgage_monthly(recycled_mortgage, budget)
+
+        options = []
+        for months in [optimal_monthly_budget(recycled_mortgage.loans, budget),
+                       allocate_monthly_budget(recycled_mortgage.loans, budget)[0]]:
+            option = recycled_mortgage.clone()
+            for loan, num_of_months in zip(option.loans, months):
+                if num_of_months != loan.num_of_months():
+                    loan.set_period(num_of_months)
+            option.schedule = option.generate_amortization_schedule()
+            options.append(option)
+        return min(options, key=Mortgage.total_payments)
 
     @staticmethod
     def amortization_diff(mortgage_before, mortgage_after):
-
+        """
+        Month by month difference between two mortgages: both schedules are zero padded to the longer one and
+        subtracted as whole arrays. 'Principal Payment' is the difference of the principal paid so far.
+        """
         max_months = max(mortgage_before.num_of_months(), mortgage_after.num_of_months())
 
-        amortization_schedule = []
-
-        # Iterate for each month
-        for month in range(1, max_months + 1):
-            # Initialize totals for the month
-            total_principal_payment = 0
-            total_interest_payment = 0
-            total_inflation_payment = 0
-            total_monthly_payment = 0
-            total_remaining_balance = 0
-
-            # Iterate through each loan
-            if month <= max_months:
-                total_principal_payment += mortgage_before.total_principal_payments(month - 1) - \
-                                           mortgage_after.total_principal_payments(month - 1)
-                total_interest_payment += mortgage_before.interest_payment(month - 1) - \
-                                          mortgage_after.interest_payment(month - 1)
-                total_inflation_payment += mortgage_before.inflation_payment(month - 1) - \
-                                          mortgage_after.inflation_payment(month - 1)
-                total_monthly_payment += mortgage_before.monthly_payment(month - 1) - \
-                                         mortgage_after.monthly_payment(month - 1)
-                total_remaining_balance += mortgage_before.remaining_balance(month - 1) - \
-                                           mortgage_after.remaining_balance(month - 1)
-
-            amortization_schedule.append({
-                'Month': month,
-                'Monthly Payment': total_monthly_payment,
-                'Principal Payment': total_principal_payment,
-                'Interest Payment': total_interest_payment,
-                'Inflation Payment': total_interest_payment,
-                # 'Remaining Balance': total_remaining_balance
-            })
-
-        combined_amortization = pd.DataFrame(amortization_schedule)
-
-        return combined_amortization
+        def aligned(mortgage, column):
+            values = np.zeros(max_months)
+            num_of_months = mortgage.num_of_months()
+            values[:num_of_months] = mortgage.schedule[column][:num_of_months]
+            return values
+
+        def difference(column):
+            return aligned(mortgage_before, column) - aligned(mortgage_after, column)
+
+        return pd.DataFrame({
+            'Month': np.arange(1, max_months + 1),
+            'Monthly Payment': difference('Monthly Payment'),
+            'Principal Payment': np.cumsum(difference('Principal Payment')),
+            'Interest Payment': difference('Interest Payment'),
+            'Inflation Payment': difference('Inflation Payment'),
+        })
 
 
 if __name__ == '__main__':
@@ -431,11 +606,11 @@ if __name__ == '__main__':
     loan2 = Loan(loan_type="Kalatz", amount=300000, num_of_months=22 * 12, interest_rate=6, grace_period=0)
 
     mortgage = Mortgage([loan1, loan2])
-    mortgage.display_mortgage_info()
+    mortgage.display_mortgage_info(verbose=True)
     # plot_interest_principal_graph_yearly(mortgage.amortization_schedule)
 
     mortgage.recycle_mortgage(350000, 'period')
 
-    mortgage.display_mortgage_info()
+    mortgage.display_mortgage_info(verbose=True)
 
     x = 1
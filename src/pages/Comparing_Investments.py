@@ -18,7 +18,7 @@ def main_compare_investments(investments: List[Investment]):
     yearly_amortizations = []
 
     for i, investment in enumerate(investments):
-        yearly_amortization = Investment.get_yearly_amortization(investment.amortization_schedule)
+        yearly_amortization = investment.yearly_amortization()
         yearly_amortizations.append(yearly_amortization)
 
 
@@ -258,7 +258,7 @@ if __name__ == '__main__':
         for i in range(len(investments)):
             with tabs[i]:
                 if amortization_type == 'Annual':
-                    amortization = np.round(Investment.get_yearly_amortization(investments[i].amortization_schedule).astype(int))
+                    amortization = np.round(investments[i].yearly_amortization().astype(int))
                 else:
                     amortization = np.round(
                         investments[i].amortization_schedule).astype(int)
@@ -22,7 +22,7 @@ def enter_mortgage_details():
 
 
 def plot_monthly_payments_graph_yearly(mortgages):
-    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.amortization_schedule) for mortgage in mortgages]
+    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.schedule) for mortgage in mortgages]
     col1, col2 = st.columns([1, 1])
     with col1:
         st.subheader("Monthly Payment:")
@@ -37,7 +37,7 @@ def plot_monthly_payments_graph_yearly(mortgages):
 
 def plot_principal_interest_yearly(mortgages):
     st.subheader("Principal-Interest Payment:")
-    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.amortization_schedule) for mortgage in mortgages]
+    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.schedule) for mortgage in mortgages]
 
     cols = st.columns([1] * len(mortgages))
     # Plot for 'Before' in the first column
@@ -93,7 +93,7 @@ def mortgage_comparison_report_details(mortgages):
 
 
 def plot_monthly_interest_graph_yearly(mortgages):
-    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.amortization_schedule) for mortgage in mortgages]
+    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.schedule) for mortgage in mortgages]
 
     col1, col2 = st.columns([1, 1])
     with col1:
@@ -108,8 +108,8 @@ def plot_monthly_interest_graph_yearly(mortgages):
 
 
 def bars_summary_section(mortgage_before, mortgage_after):
-    yearly_amortization_before = Loan.get_yearly_amortization(mortgage_before.amortization_schedule)
-    yearly_amortization_after = Loan.get_yearly_amortization(mortgage_after.amortization_schedule)
+    yearly_amortization_before = Loan.get_yearly_amortization(mortgage_before.schedule)
+    yearly_amortization_after = Loan.get_yearly_amortization(mortgage_after.schedule)
 
     st.subheader("Summary:")
     col1, col2, col3 = st.columns(3)
@@ -117,8 +117,8 @@ def bars_summary_section(mortgage_before, mortgage_after):
     with col1:
         st.subheader("Period")
         st.bar_chart({
-            'Before': mortgage_before.num_of_months(),
-            'After': mortgage_after.num_of_months()
+            'Before': mortgage_before.summary().num_of_months,
+            'After': mortgage_after.summary().num_of_months
         }, color=['#add8e6'])
 
     with col2:
@@ -131,34 +131,33 @@ def bars_summary_section(mortgage_before, mortgage_after):
     with col3:
         st.subheader("Avg. Interest Rate")
         st.bar_chart({
-            'Before': mortgage_before.average_interest_rate(),
-            'After': mortgage_after.average_interest_rate()
+            'Before': mortgage_before.summary().average_interest_rate,
+            'After': mortgage_after.summary().average_interest_rate
         }, color=['#eb7734'])
 
 
 def summary_section(mortgages):
-
+    summaries = [mortgage.summary() for mortgage in mortgages]
     summary_data = {
-        "Name": [mortgage.name for mortgage in mortgages],
-        "Amount": [np.round(mortgage.loan_amount()) for mortgage in mortgages],
-        "Period (Years)": [np.round(mortgage.num_of_months()/12,2) for mortgage in mortgages],
-        "Interest Payments": [np.round(mortgage.total_interest_payments()) for mortgage in mortgages],
-        "Cost": [np.round(mortgage.total_payments()) for mortgage in mortgages],
-        "First Payment": [np.round(mortgage.monthly_payment(0)) for mortgage in mortgages],
-        "Maximum Payment": [np.round(mortgage.highest_monthly_payment()) for mortgage in mortgages],
-        "Cost per Currency": [np.round(mortgage.cost_per_currency(),2) for mortgage in mortgages],
-        "Bank IRR": [np.round(mortgage.get_irr(), 2) for mortgage in mortgages],
-        "Average Interest": [round(mortgage.average_interest_rate(),2) for mortgage in mortgages],
-        "CPI Part [%]": [round(mortgage.CPI_bound_amount()/mortgage.loan_amount(), 2) for mortgage in mortgages],
-        "Risk": [np.round(mortgage.get_volatility(),2) if not np.isnan(mortgage.get_volatility()) else "N/A" for mortgage in mortgages]
+        "Name": [summary.name for summary in summaries],
+        "Amount": [np.round(summary.amount) for summary in summaries],
+        "Period (Years)": [np.round(summary.num_of_months/12,2) for summary in summaries],
+        "Interest Payments": [np.round(summary.total_interest) for summary in summaries],
+        "Cost": [np.round(summary.total_payments) for summary in summaries],
+        "First Payment": [np.round(summary.first_payment) for summary in summaries],
+        "Maximum Payment": [np.round(summary.highest_monthly_payment) for summary in summaries],
+        "Cost per Currency": [np.round(summary.cost_per_currency,2) for summary in summaries],
+        "Bank IRR": [np.round(summary.irr, 2) for summary in summaries],
+        "Average Interest": [round(summary.average_interest_rate,2) for summary in summaries],
+        "CPI Part [%]": [round(summary.cpi_bound_amount/summary.amount, 2) for summary in summaries],
+        "Risk": [np.round(summary.volatility,2) if not np.isnan(summary.volatility) else "N/A" for summary in summaries]
     }
     summary_df_table = pd.DataFrame(summary_data)
 
     st.dataframe(summary_df_table.set_index('Name').transpose(), use_container_width=True, hide_index=False)
 
     summary_df = summary_df_table.copy()
-    summary_df["Indexation"] = [np.round(mortgage.total_inflation_payments()) for mortgage in
-                                mortgages]
+    summary_df["Indexation"] = [np.round(summary.total_inflation) for summary in summaries]
 
     col_cost, col_risk = st.columns([3, 2], gap='large')
     with col_cost:
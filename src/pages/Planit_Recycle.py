@@ -23,14 +23,14 @@ def enter_mortgage_details():
 
 def display_yearly_amortization_table(mortgage, amortization_type):
     if amortization_type == 'Yearly':
-        amortization = Loan.get_yearly_amortization(mortgage.amortization_schedule.reset_index())
+        amortization = Loan.get_yearly_amortization(mortgage.schedule)
     else:
         amortization = mortgage.amortization_schedule
     st.table(amortization)
 
 
 def plot_monthly_payments_graph_yearly(mortgages):
-    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.amortization_schedule) for mortgage in mortgages]
+    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.schedule) for mortgage in mortgages]
 
     col1, col2 = st.columns([1, 1], gap='large')
     with col1:
@@ -44,7 +44,7 @@ def plot_monthly_payments_graph_yearly(mortgages):
 
 
 def plot_monthly_interest_graph_yearly(mortgages):
-    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.amortization_schedule) for mortgage in mortgages]
+    yearly_amortizations = [Loan.get_yearly_amortization(mortgage.schedule) for mortgage in mortgages]
 
     col1, col2 = st.columns([1, 1], gap='large')
     with col1:
@@ -123,7 +123,7 @@ def saving_investment(mortgage: Mortgage, extra_payment: int, monthly_extra:int=
                                                              stocks_yearly_fee_percent=st.session_state.StocksMarketFeesPercentage,
                                                              gain_tax=st.session_state.TaxGainPercentage,
                                                              name="Mortgage Recycle Period change",
-                                                             investment_years=mortgage.num_of_months() // 12 + 10).amortization_schedule
+                                                             investment_years=mortgage.summary().num_of_months // 12 + 10).amortization_schedule
 
     amortization_schedule_payment = MortgageRecycleInvestment(initial_fund=extra_payment,
                                                               mortgage=mortgage,
@@ -132,13 +132,13 @@ def saving_investment(mortgage: Mortgage, extra_payment: int, monthly_extra:int=
                                                               stocks_yearly_fee_percent=st.session_state.StocksMarketFeesPercentage,
                                                               gain_tax=st.session_state.TaxGainPercentage,
                                                               name="Mortgage Recycle payment change",
-                                                              investment_years=mortgage.num_of_months() // 12 + 10).amortization_schedule
+                                                              investment_years=mortgage.summary().num_of_months // 12 + 10).amortization_schedule
 
     stockmarket_schedule_payment = StocksMarketInvestment(initial_fund=extra_payment,
                                                           yearly_return=st.session_state.StocksMarketYearlyReturn,
                                                           yearly_fee_percent=st.session_state.StocksMarketFeesPercentage,
                                                           gain_tax=st.session_state.TaxGainPercentage,
-                                                          investment_years=mortgage.num_of_months() // 12 + 10).amortization_schedule
+                                                          investment_years=mortgage.summary().num_of_months // 12 + 10).amortization_schedule
 
     yearly_amortization_period = Investment.get_yearly_amortization(amortization_schedule_period)
     yearly_amortization_payment = Investment.get_yearly_amortization(amortization_schedule_payment)
@@ -221,8 +221,8 @@ def mortgage_recycle_report_details(mortgage_before: Mortgage, mortgage_after: M
                                              ['Loan Type', 'Loan Amount', 'First Payment', 'Number of Months',
                                               'Total Interest', 'Total Cost', 'Cost to Currency']])
 
-    yearly_amortization_before = Loan.get_yearly_amortization(mortgage_before.amortization_schedule)
-    yearly_amortization_after = Loan.get_yearly_amortization(mortgage_after.amortization_schedule)
+    yearly_amortization_before = Loan.get_yearly_amortization(mortgage_before.schedule)
+    yearly_amortization_after = Loan.get_yearly_amortization(mortgage_after.schedule)
 
     st.divider()
     plot_monthly_payments_graph_yearly([mortgage_before, mortgage_after])
@@ -238,8 +238,8 @@ def mortgage_recycle_report_details(mortgage_before: Mortgage, mortgage_after: M
 
 
 def bars_summary_section(mortgage_before, mortgage_after):
-    yearly_amortization_before = Loan.get_yearly_amortization(mortgage_before.amortization_schedule)
-    yearly_amortization_after = Loan.get_yearly_amortization(mortgage_after.amortization_schedule)
+    yearly_amortization_before = Loan.get_yearly_amortization(mortgage_before.schedule)
+    yearly_amortization_after = Loan.get_yearly_amortization(mortgage_after.schedule)
 
     st.subheader("Summary:")
     col1, col2, col3 = st.columns(3)
@@ -247,8 +247,8 @@ def bars_summary_section(mortgage_before, mortgage_after):
     with col1:
         st.subheader("Period")
         st.bar_chart({
-            'Before': mortgage_before.num_of_months(),
-            'After': mortgage_after.num_of_months()
+            'Before': mortgage_before.summary().num_of_months,
+            'After': mortgage_after.summary().num_of_months
         }, color=['#add8e6'])
 
     with col2:
@@ -261,27 +261,27 @@ def bars_summary_section(mortgage_before, mortgage_after):
     with col3:
         st.subheader("Avg. Interest Rate")
         st.bar_chart({
-            'Before': mortgage_before.average_interest_rate(),
-            'After': mortgage_after.average_interest_rate()
+            'Before': mortgage_before.summary().average_interest_rate,
+            'After': mortgage_after.summary().average_interest_rate
         }, color=['#eb7734'])
 
 
 def summary_section(mortgage_before: Mortgage, mortgage_after:Mortgage):
     # Use the last item in the dataframes for "Interest Payment"
 
-    mortgages = [mortgage_before, mortgage_after]
+    summaries = [mortgage_before.summary(), mortgage_after.summary()]
     summary_data = {
-        "Name": [mortgage.name for mortgage in mortgages],
-        "Amount": [np.round(mortgage.loan_amount()) for mortgage in mortgages],
-        "Period (Years)": [np.round(mortgage.num_of_months(),2) for mortgage in mortgages],
-        "Interest": [np.round(mortgage.total_interest_payments()) for mortgage in mortgages],
-        "Indexation": [np.round(mortgage.total_inflation_payments()) for mortgage in mortgages],
-        "Cost": [np.round(mortgage.cost()) for mortgage in mortgages],
-        "Cost per Currency": [np.round(mortgage.cost_per_currency(), 2) for mortgage in mortgages],
-        "First Payment": [np.round(mortgage.monthly_payment(0)) for mortgage in mortgages],
-        "Maximum Payment": [np.round(mortgage.highest_monthly_payment()) for mortgage in mortgages],
-        "Total Predicted Interest (IRR)": [np.round(mortgage.get_irr(), 2) for mortgage in mortgages],
-        "Risk": [round(mortgage.get_volatility()) for mortgage in mortgages]
+        "Name": [summary.name for summary in summaries],
+        "Amount": [np.round(summary.amount) for summary in summaries],
+        "Period (Years)": [np.round(summary.num_of_months,2) for summary in summaries],
+        "Interest": [np.round(summary.total_interest) for summary in summaries],
+        "Indexation": [np.round(summary.total_inflation) for summary in summaries],
+        "Cost": [np.round(summary.cost) for summary in summaries],
+        "Cost per Currency": [np.round(summary.cost_per_currency, 2) for summary in summaries],
+        "First Payment": [np.round(summary.first_payment) for summary in summaries],
+        "Maximum Payment": [np.round(summary.highest_monthly_payment) for summary in summaries],
+        "Total Predicted Interest (IRR)": [np.round(summary.irr, 2) for summary in summaries],
+        "Risk": [round(summary.volatility) for summary in summaries]
     }
 
     # Add the savings row.
@@ -292,7 +292,7 @@ def summary_section(mortgage_before: Mortgage, mortgage_after:Mortgage):
     new_row = numeric_columns.iloc[-2] - numeric_columns.iloc[-1]
     # Append the new row to the original DataFrame
     summary_df = pd.concat([summary_df, pd.DataFrame([new_row], columns=numeric_columns.columns)], ignore_index=True)
-    extra = mortgage_before.loan_amount() - mortgage_after.loan_amount() # reduce the loan amount from the cost savings
+    extra = summaries[0].amount - summaries[1].amount # reduce the loan amount from the cost savings
     # summary_df.at[summary_df.index[-1], 'Cost'] -= extra
     summary_df.at[summary_df.index[-1], 'Name'] = 'Savings'
     savings_row = summary_df.iloc[-1]
@@ -316,7 +316,7 @@ def summary_section(mortgage_before: Mortgage, mortgage_after:Mortgage):
                       delta_color='inverse')
 
             st.metric(label='Cost Savings', value="{:,.0f}".format(savings_row["Cost"]),
-                      delta=f'{-np.round(savings_row["Cost"] / (before_row["Cost"]-mortgage_before.loan_amount()) * 100, 2)}%',
+                      delta=f'{-np.round(savings_row["Cost"] / (before_row["Cost"]-summaries[0].amount) * 100, 2)}%',
                       delta_color='inverse')
 
         with st2_2:
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+
+from constants import CPI, PortfolioChunkSize
+from finance_utils import CPIVAR, PrimeInterestVAR
+from irr import irr_batch
+from loan import LoanBatch, LoanType, amortize_batch
+from mortgage import Mortgage
+from schedule import LoanSchedule
+from storage import engine_hash, save_arrays, load_arrays, encode_loan_type, decode_loan_type
+from summary import MortgageSummary
+
+
+class MortgagePortfolio:
+    """
+    A book of mortgages evaluated as one array computation. The loan terms are (mortgages, loans) matrices, padded with
+    empty loans up to the longest mortgage, and the schedules are (mortgages, loans, months) arrays summed along the
+    loan axis. Mortgages are processed chunk_size at a time so a large book never holds all its loan schedules at once.
+    """
+    def __init__(self, amount, num_of_months, interest_rate, grace_period, cpi, loan_type, names=None,
+                 chunk_size=PortfolioChunkSize):
+        """
+        All terms are (mortgages, loans) matrices, the padding loans have a zero amount and term. names labels the
+        mortgages (their position in the book by default).
+        """
+        self.amount = np.atleast_2d(np.asarray(amount, dtype=float))
+        self.num_of_months, self.grace_period = (np.broadcast_to(np.asarray(values, dtype=int), self.amount.shape) for
+                                                 values in (num_of_months, grace_period))
+        self.interest_rate, self.cpi = (np.broadcast_to(np.asarray(values, dtype=float), self.amount.shape) for values
+                                        in (interest_rate, cpi))
+        self.loan_type = np.broadcast_to(np.asarray(loan_type), self.amount.shape)
+        self.names = list(range(len(self.amount))) if names is None else list(names)
+        self.chunk_size = chunk_size
+        self._summary = None
+        # Aggregate schedule columns read back by load, served by schedules without amortizing
+        self._schedules = {}
+
+    def __len__(self):
+        return len(self.amount)
+
+    @staticmethod
+    def from_frame(df: pd.DataFrame, mortgage_column='mortgage', cpi=CPI, chunk_size=PortfolioChunkSize):
+        """
+        Packs a single frame of the loans of many mortgages, the columns of Mortgage.columns_types plus
+        mortgage_column naming the mortgage of every loan. The terms are parsed as whole columns once for the book.
+        """
+        terms = Mortgage.parse_dataframe(df, cpi)
+        codes, names = pd.factorize(df[mortgage_column], sort=False)
+        positions = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+        shape = (len(names), positions.max(initial=-1) + 1)
+
+        packed = {}
+        for key, values in terms.items():
+            packed[key] = np.full(shape, None, dtype=object) if key == 'loan_type' else np.zeros(shape, values.dtype)
+            packed[key][codes, positions] = values
+        return MortgagePortfolio(**packed, names=names, chunk_size=chunk_size)
+
+    @staticmethod
+    def from_dataframes(frames, names=None, cpi=CPI, chunk_size=PortfolioChunkSize):
+        "Packs one loans frame per mortgage, e.g. the customer CSVs Mortgage.from_dataframe reads one at a time."
+        frames = list(frames)
+        names = list(range(len(frames))) if names is None else list(names)
+        df = pd.concat(frames, keys=range(len(frames)), names=['mortgage', None]).reset_index(level='mortgage')
+        portfolio = MortgagePortfolio.from_frame(df, cpi=cpi, chunk_size=chunk_size)
+        portfolio.names = [names[code] for code in portfolio.names]
+        return portfolio
+
+    @staticmethod
+    def from_mortgages(mortgages, chunk_size=PortfolioChunkSize):
+        "Packs the current terms of Mortgage objects."
+        mortgages = list(mortgages)
+        shape = (len(mortgages), max((len(mortgage.loans) for mortgage in mortgages), default=0))
+        terms = {key: np.zeros(shape) for key in ['amount', 'num_of_months', 'interest_rate', 'grace_period', 'cpi']}
+        terms['loan_type'] = np.full(shape, None, dtype=object)
+        for i, mortgage in enumerate(mortgages):
+            for j, loan in enumerate(mortgage.loans):
+                terms['amount'][i, j], terms['num_of_months'][i, j] = loan.loan_amount(), loan.num_of_months()
+                terms['interest_rate'][i, j], terms['grace_period'][i, j] = loan.interest_rate, loan.grace_period
+                terms['cpi'][i, j], terms['loan_type'][i, j] = loan.cpi, loan.loan_type
+        return MortgagePortfolio(**terms, names=[mortgage.name for mortgage in mortgages], chunk_size=chunk_size)
+
+    def mortgage(self, index) -> Mortgage:
+        "A Mortgage object of one mortgage of the book, to drill down into."
+        loans = self.num_of_months[index] > 0
+        loan_types = [decode_loan_type(loan_type) for loan_type in self.loan_type[index][loans].tolist()]
+        batch = LoanBatch(self.amount[index][loans], self.num_of_months[index][loans],
+                          self.interest_rate[index][loans], self.grace_period[index][loans], self.cpi[index][loans])
+        return Mortgage(batch.loans(loan_types), name=self.names[index])
+
+    def chunks(self):
+        for start in range(0, len(self), self.chunk_size):
+            yield slice(start, min(start + self.chunk_size, len(self)))
+
+    def mortgage_months(self):
+        "The schedule length of every mortgage: its longest loan term, zero padded loans included."
+        return self.num_of_months.max(axis=1, initial=0)
+
+    def _amortize_chunk(self, rows, columns):
+        """
+        The (mortgages, months) aggregate schedule columns of a chunk of mortgages: its loans are amortized together,
+        each cut at its own term, scattered into a (mortgages, loans, months) array and summed along the loan axis.
+        """
+        num_of_months = self.num_of_months[rows]
+        num_mortgages, num_loans = num_of_months.shape
+        max_months = int(num_of_months.max(initial=0))
+        loans = num_of_months.ravel() > 0
+        amortized = dict(zip(LoanSchedule.fields, amortize_batch(
+            *(terms[rows].ravel()[loans] for terms in
+              (self.amount, self.num_of_months, self.interest_rate, self.grace_period, self.cpi)))))
+        within_term = np.arange(max_months) < num_of_months.ravel()[loans][:, None]
+
+        totals = {}
+        stacked = np.zeros((num_mortgages * num_loans, max_months))
+        for column in columns:
+            stacked[loans] = np.where(within_term, amortized[column][:, :max_months], 0)
+            totals[column] = stacked.reshape(num_mortgages, num_loans, max_months).sum(axis=1)
+        return totals
+
+    def schedules(self, columns=('Monthly Payment',), dtype=None):
+        """
+        The aggregate schedule columns of every mortgage as (mortgages, months) arrays, zero padded past the end of
+        each mortgage. Fully repaid mortgages keep an all zero row, like the empty schedule of Mortgage. Columns read
+        back by load are returned as the stored memory maps unless another dtype is asked for; computed columns are
+        float64 by default.
+        """
+        columns = list(columns)
+        if all(column in self._schedules for column in columns):
+            return {column: self._schedules[column] if dtype is None else self._schedules[column].astype(dtype, copy=False)
+                    for column in columns}
+        repaid = self.fully_repaid()
+        max_months = int(self.mortgage_months().max(initial=0))
+        schedules = {column: np.zeros((len(self), max_months), dtype=dtype or np.float64) for column in columns}
+        for rows in self.chunks():
+            totals = self._amortize_chunk(rows, columns)
+            for column in columns:
+                months = totals[column].shape[1]
+                schedules[column][rows, :months] = np.where(repaid[rows, None], 0, totals[column])
+        return schedules
+
+    def loan_amount(self):
+        return self.amount.sum(axis=1)
+
+    def fully_repaid(self):
+        return self.loan_amount() < 1
+
+    def get_volatility(self):
+        "The amount weighted volatility of every mortgage, the vectorized Loan.get_volatility of all the loans."
+        is_fixed = self.loan_type == LoanType.FIXED.name
+        loan_volatility = (np.where(is_fixed, 0, PrimeInterestVAR.value_at_risk(self.num_of_months)) +
+                           np.where(self.cpi == 0, 0, CPIVAR.value_at_risk(self.num_of_months))) * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.divide((self.amount * loan_volatility).sum(axis=1), self.loan_amount())
+
+    def summary(self) -> pd.DataFrame:
+        """
+        The MortgageSummary figures of every mortgage, one row per mortgage indexed by name. The reductions run over
+        whole chunks of mortgages and the IRRs of a chunk are solved together by irr_batch.
+        """
+        if self._summary is not None:
+            return self._summary
+
+        amount = self.loan_amount()
+        repaid = self.fully_repaid()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average_interest_rate = np.where(amount > 0, (self.amount * self.interest_rate).sum(axis=1) / amount, 0)
+        figures = {
+            'amount': amount,
+            'num_of_months': np.where(repaid, 0, np.where(self.amount > 0, self.num_of_months, 0).max(axis=1,
+                                                                                                     initial=0)),
+            'average_interest_rate': average_interest_rate,
+            'cpi_bound_amount': (self.amount * (self.cpi > 0)).sum(axis=1),
+        }
+        for name in ['first_payment', 'average_monthly_payment', 'highest_monthly_payment', 'total_interest',
+                     'total_inflation', 'total_payments', 'irr']:
+            figures[name] = np.zeros(len(self))
+
+        schedule_months = np.maximum(self.mortgage_months(), 1)
+        for rows in self.chunks():
+            totals = self._amortize_chunk(rows, ['Monthly Payment', 'Interest Payment', 'Inflation Payment'])
+            payments = np.where(repaid[rows, None], 0, totals['Monthly Payment'])
+            figures['first_payment'][rows] = payments[:, 0] if payments.shape[1] else 0
+            figures['average_monthly_payment'][rows] = payments.sum(axis=1) / schedule_months[rows]
+            figures['highest_monthly_payment'][rows] = payments.max(axis=1, initial=0)
+            figures['total_interest'][rows] = np.where(repaid[rows], 0, totals['Interest Payment'].sum(axis=1))
+            figures['total_inflation'][rows] = np.where(repaid[rows], 0, totals['Inflation Payment'].sum(axis=1))
+            figures['total_payments'][rows] = payments.sum(axis=1)
+            figures['irr'][rows] = irr_batch(np.column_stack([-amount[rows], payments]),
+                                             guess=average_interest_rate[rows] / 12 / 100) * 12 * 100
+
+        figures['cost'] = figures['total_payments'] - amount
+        with np.errstate(divide='ignore', invalid='ignore'):
+            figures['cost_per_currency'] = np.where(amount > 0, figures['total_payments'] / amount, np.nan)
+        figures['volatility'] = self.get_volatility()
+
+        columns = [field for field in MortgageSummary._fields if field not in ('name', 'loans')]
+        self._summary = pd.DataFrame(figures, index=pd.Index(self.names, name='name'), columns=columns)
+        return self._summary
+
+    def get_irrs(self):
+        return self.summary()['irr'].to_numpy()
+
+    def save(self, path, columns=tuple(LoanSchedule.fields), dtype=np.float64):
+        """
+        Writes the loan terms, the summary and the given aggregate schedule columns of the book to an .npz file,
+        tagged with the engine hash. E.g. columns=['Monthly Payment'] with dtype=np.float32 keeps a large book small.
+        """
+        schedules = self.schedules(columns, dtype)
+        summary = self.summary()
+        arrays = {'engine': np.array(engine_hash()), 'names': np.asarray(self.names),
+                  'amount': self.amount, 'num_of_months': self.num_of_months, 'interest_rate': self.interest_rate,
+                  'grace_period': self.grace_period, 'cpi': self.cpi,
+                  'loan_type': np.array([encode_loan_type(loan_type) for loan_type in self.loan_type.ravel()],
+                                        dtype=str).reshape(self.loan_type.shape)}
+        arrays.update({'schedule.' + LoanSchedule.fields[column]: values for column, values in schedules.items()})
+        arrays.update({'summary.' + column: summary[column].to_numpy() for column in summary.columns})
+        save_arrays(path, arrays)
+
+    @staticmethod
+    def load(path, mmap_mode='r', chunk_size=PortfolioChunkSize):
+        """
+        Reads a book written by save. The terms and the stored schedules are memory mapped, so a large book loads in
+        milliseconds and only the pages that are read come from disk. When the file was written by another version
+        of the engine the stored figures are dropped and recomputed on demand.
+        """
+        arrays = load_arrays(path, mmap_mode)
+        portfolio = MortgagePortfolio(arrays['amount'], arrays['num_of_months'], arrays['interest_rate'],
+                                      arrays['grace_period'], arrays['cpi'], arrays['loan_type'],
+                                      names=arrays['names'].tolist(), chunk_size=chunk_size)
+        if arrays['engine'].item() == engine_hash():
+            portfolio._schedules = {column: arrays['schedule.' + field] for column, field in LoanSchedule.fields.items()
+                                    if 'schedule.' + field in arrays}
+            columns = [field for field in MortgageSummary._fields if field not in ('name', 'loans')]
+            portfolio._summary = pd.DataFrame({column: arrays['summary.' + column] for column in columns},
+                                              index=pd.Index(arrays['names'], name='name'))
+        return portfolio
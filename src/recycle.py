@@ -0,0 +1,463 @@
+import copy
+import heapq
+
+import numpy as np
+from scipy.optimize import linprog
+
+from loan import amortize_batch
+from irr import irr_batch
+from constants import MortgageRecycleIterationAmount, MaxLoanMonths, BalanceDecimals
+
+
+def first_payments(loan, terms):
+    """
+    Indexed first amortizing payment per currency of the loan for every number of amortization months in terms,
+    the payment Loan.calculate_loan_periods inverts.
+    """
+    r = (loan.interest_rate / 12) / 100
+    monthly_cpi = 1 + (loan.cpi / 12) / 100
+    annuity_factor = 1 / terms if r == 0 else r / -np.expm1(-np.log1p(r) * terms)
+    return monthly_cpi * annuity_factor
+
+
+def unit_costs(loan, terms):
+    "Cost per currency (total payments per unit amount) of the loan for every number of amortization months in terms."
+    if loan.rate_path is None and loan.cpi_path is None:
+        # The indexed payments of a term form a geometric series: first payment * (1 + c + ... + c^(k-1))
+        monthly_cpi = 1 + (loan.cpi / 12) / 100
+        indexation = terms if loan.cpi == 0 else np.expm1(np.log(monthly_cpi) * terms) / (monthly_cpi - 1)
+        return first_payments(loan, terms) * indexation
+    return amortize_batch(1, loan.grace_period + terms, loan._rate_paths(), loan.grace_period,
+                          loan._cpi_paths())[0].sum(axis=1)
+
+
+class PaydownCurve:
+    """
+    Cost per currency of a loan as a function of its balance while the loan is being paid down.
+    When the payment shrinks ('payment') the schedule only scales, so the cost per currency stays the same until the
+    loan is repaid. When the period shrinks ('period') the first payment is kept, and the cost steps down to that of a
+    term one month shorter every time the balance falls below what that payment repays over the shorter term.
+    """
+
+    def __init__(self, loan, change='payment'):
+        self.balance = loan.loan_amount()
+        self.paid = 0
+        months = loan.num_of_months() - loan.grace_period
+        payment = loan.monthly_payment(loan.grace_period)
+        if change.lower() != 'period' or self.balance <= 0 or months < 1 or payment <= 0:
+            self.bounds = np.array([0, self.balance])
+            self.levels = np.array([0, loan.cost_per_currency()])
+            self.term = 1
+            return
+
+        # bounds[k] is the largest balance the first payment repays in k amortization months, the inverse of
+        # Loan.calculate_loan_periods, and levels[k] the cost per currency of a loan with that term
+        terms = np.arange(1, months + 1)
+        # Floored to BalanceDecimals, so a loan paid down exactly to a bound keeps that term once its balance is rounded
+        scale = 10.0 ** BalanceDecimals
+        self.bounds = np.concatenate([[0], np.floor(payment / first_payments(loan, terms) * scale) / scale])
+        self.bounds[-1] = self.balance
+        self.levels = np.concatenate([[0], unit_costs(loan, terms)])
+        self.term = months
+
+    def level(self):
+        return self.levels[self.term]
+
+    def room(self):
+        "How much can be paid before the cost per currency changes."
+        return self.balance - self.bounds[self.term - 1]
+
+    def pay(self, amount):
+        # A payment within float noise of the balance repays the loan, so no residue keeps it alive
+        if amount >= self.balance - 10.0 ** -BalanceDecimals:
+            self.paid += self.balance
+            self.balance = 0.0
+        else:
+            self.paid += amount
+            self.balance -= amount
+        while self.term > 0 and self.balance <= self.bounds[self.term - 1]:
+            self.term -= 1
+
+
+def allocate_lump_sum(loans, extra_payment, change='payment', exact=False, step=MortgageRecycleIterationAmount):
+    """
+    Splits a lump sum between loans, always paying the loan with the highest cost per currency.
+    The loans are not changed: their cost curves (PaydownCurve) are computed once and the allocation runs on those,
+    keeping the loans in a heap ordered by their current cost. By default every step pays `step`, like the historical
+    10,000 chunks; with exact=True every step pays exactly up to the balance where the loan's cost changes, so the
+    allocation has no granularity. Returns the amount paid down on every loan.
+    """
+    return allocate_lump_sums(loans, [extra_payment], change, exact, step)[0][0]
+
+
+def allocate_lump_sums(loans, extra_payments, change='payment', exact=False, step=MortgageRecycleIterationAmount):
+    """
+    allocate_lump_sum for a whole grid of increasing lump sums in one pass: the allocation of every sum continues from
+    the whole steps of the previous one, and only its last, partial step is paid apart. Every row is therefore the
+    allocation a fresh allocate_lump_sum of that sum makes, whether or not the sums are multiples of step. Returns the
+    (sums, loans) matrices of paydowns and of amortization months (grace period excluded) left on every loan.
+    """
+    curves = [PaydownCurve(loan, change) for loan in loans]
+    heap = [(-curve.level(), i) for i, curve in enumerate(curves) if curve.balance > 0]
+    heapq.heapify(heap)
+
+    paydowns = np.zeros((len(extra_payments), len(loans)))
+    terms = np.zeros((len(extra_payments), len(loans)), dtype=int)
+    spent = 0
+    for j, extra_payment in enumerate(extra_payments):
+        # Only whole steps carry over to the next sum, they are the steps a fresh allocation of that sum takes too
+        while heap:
+            i = heap[0][1]
+            curve = curves[i]
+            amount = curve.room() if exact else min(step, curve.balance)
+            if spent + amount > extra_payment:
+                break
+            heapq.heappop(heap)
+            curve.pay(amount)
+            spent += amount
+            if curve.balance > 0:
+                heapq.heappush(heap, (-curve.level(), i))
+        paydowns[j] = [curve.paid for curve in curves]
+        terms[j] = [curve.term for curve in curves]
+        if heap and extra_payment > spent:
+            # The last step of this sum is partial, it is paid on a copy so it does not move the later steps
+            i = heap[0][1]
+            partial = copy.copy(curves[i])
+            partial.pay(extra_payment - spent)
+            paydowns[j, i], terms[j, i] = partial.paid, partial.term
+    return paydowns, terms
+
+
+class PeriodCurve:
+    """
+    First payment and annual IRR of a loan out of its grace period for every term up to its current one, indexed by
+    the number of months k. Raising the monthly payment of a loan only moves it along these curves.
+    """
+
+    def __init__(self, loan):
+        self.term = loan.num_of_months()
+        terms = np.arange(1, self.term + 1)
+        self.payments = np.concatenate([[np.inf], loan.loan_amount() * first_payments(loan, terms)])
+
+        if loan.rate_path is None and loan.cpi_path is None:
+            # The discounted indexed annuity repays the loan exactly at (1+r)c - 1 per month, whatever the term
+            irrs = np.full(self.term, ((1 + loan.interest_rate / 1200) * (1 + loan.cpi / 1200) - 1) * 12 * 100)
+        else:
+            unit_payments = amortize_batch(1, terms, loan._rate_paths(), 0, loan._cpi_paths())[0]
+            cashflows = np.column_stack([-np.ones(self.term), unit_payments])
+            irrs = irr_batch(cashflows, guess=(loan.interest_rate + loan.cpi) / 12 / 100) * 12 * 100
+        self.irrs = np.concatenate([[-np.inf], irrs])
+
+    def irr(self):
+        return self.irrs[self.term]
+
+    def num_of_months(self):
+        return self.term
+
+    def shorten(self, budget, competing_irr):
+        """
+        Shortens the term as far as the extra monthly budget allows while this loan keeps the highest IRR, the
+        position the one-month-at-a-time greedy would reach. Returns the payment increase.
+        """
+        # The greedy keeps stepping down from term k while irrs[k] >= competing_irr
+        below = np.flatnonzero(self.irrs[1:self.term] < competing_irr)
+        shortest = below[-1] + 1 if len(below) else 1
+        # Payments fall with the term, so the affordable terms are the suffix found by bisection
+        increases = self.payments[1:self.term + 1] - self.payments[self.term]
+        affordable = np.searchsorted(-increases, -budget, side='left') + 1
+        new_term = int(max(shortest, affordable))
+        increase = self.payments[new_term] - self.payments[self.term]
+        self.term = new_term
+        return increase
+
+
+def allocate_monthly_budget(loans, extra_payment):
+    """
+    Spends an extra monthly budget on shortening the loans out of their grace period, highest IRR first, along their
+    PeriodCurve. Returns the new number of months of every loan and the number of iterations used.
+    """
+    curves = {i: PeriodCurve(loan) for i, loan in enumerate(loans) if
+              loan.loan_amount() > 0 and loan.grace_period == 0 and loan.num_of_months() > 1}
+    heap = [(-curve.irr(), i) for i, curve in curves.items()]
+    heapq.heapify(heap)
+
+    remainder = extra_payment
+    iterations = 0
+    while heap and remainder > 0:
+        iterations += 1
+        _, i = heapq.heappop(heap)
+        curve = curves[i]
+        previous_term = curve.term
+        remainder -= curve.shorten(remainder, -heap[0][0] if heap else -np.inf)
+        if curve.term == previous_term:
+            # Not even one month of the best loan is affordable
+            break
+        if curve.term > 1:
+            heapq.heappush(heap, (-curve.irr(), i))
+
+    months = [curves[i].num_of_months() if i in curves else loan.num_of_months() for i, loan in enumerate(loans)]
+    return months, iterations
+
+
+class ExtensionCurve:
+    """
+    First amortizing payment and cost per currency of a loan for every term from 1 up to the longest allowed
+    (MaxLoanMonths with the grace period), indexed by the number of amortization months k. Lowering the monthly
+    payment of a loan only moves it along these curves.
+    """
+
+    def __init__(self, loan, max_months=MaxLoanMonths):
+        self.grace_period = loan.grace_period
+        self.term = loan.num_of_months() - loan.grace_period
+        self.max_term = max(max_months - loan.grace_period, self.term)
+        terms = np.arange(1, self.max_term + 1)
+        self.payments = np.concatenate([[np.inf], loan.loan_amount() * first_payments(loan, terms)])
+        self.costs = np.concatenate([[0], unit_costs(loan, terms)])
+
+    def cost(self):
+        return self.costs[self.term]
+
+    def num_of_months(self):
+        return self.grace_period + self.term
+
+    def longest(self, competing_cost):
+        "The longest term this loan reaches while it is still the cheapest one, the one-step-at-a-time greedy position."
+        above = np.flatnonzero(self.costs[self.term + 1:] > competing_cost)
+        return self.term + 1 + above[0] if len(above) else self.max_term
+
+    def completion(self, budget):
+        "The shortest longer term that lowers the payment by at least budget, or None when no allowed term does."
+        decreases = self.payments[self.term] - self.payments[self.term + 1:]
+        shortest = np.searchsorted(decreases, budget, side='left')
+        return self.term + 1 + int(shortest) if shortest < len(decreases) else None
+
+    def extend(self, new_term):
+        "Lengthens the term to new_term. Returns the payment decrease."
+        decrease = self.payments[self.term] - self.payments[new_term]
+        self.term = int(new_term)
+        return decrease
+
+
+def allocate_monthly_reduction(loans, less_payment):
+    """
+    Lowers the monthly payment by at least -less_payment, extending the cheapest loans out of their grace period first
+    along their ExtensionCurve. Returns the new number of months of every loan and the number of iterations used.
+    """
+    curves = {i: ExtensionCurve(loan) for i, loan in enumerate(loans) if
+              loan.loan_amount() > 0 and loan.grace_period == 0 and 0 < loan.num_of_months() < MaxLoanMonths}
+    heap = [(curve.cost(), i) for i, curve in curves.items()]
+    heapq.heapify(heap)
+
+    remainder = -less_payment
+    iterations = 0
+    while heap and remainder > 0:
+        iterations += 1
+        _, i = heapq.heappop(heap)
+        curve = curves[i]
+        longest = curve.longest(heap[0][0] if heap else np.inf)
+        completion = curve.completion(remainder)
+        if completion is not None and completion <= longest:
+            # The last step: of all the loans, extend the one whose shortest completing extension cuts the least
+            completions = {j: curves[j].completion(remainder) for j in [i] + [j for _, j in heap]}
+            j = min((j for j, term in completions.items() if term is not None),
+                    key=lambda j: curves[j].payments[curves[j].term] - curves[j].payments[completions[j]])
+            remainder -= curves[j].extend(completions[j])
+            break
+        remainder -= curve.extend(longest)
+        if curve.term < curve.max_term:
+            heapq.heappush(heap, (curve.cost(), i))
+
+    months = [curves[i].num_of_months() if i in curves else loan.num_of_months() for i, loan in enumerate(loans)]
+    return months, iterations
+
+
+def lower_hull(x, y):
+    "Indices of the lower convex hull of points sorted by increasing x (monotone chain)."
+    hull = []
+    for i in range(len(x)):
+        while len(hull) >= 2 and ((x[hull[-1]] - x[hull[-2]]) * (y[i] - y[hull[-2]]) -
+                                  (y[hull[-1]] - y[hull[-2]]) * (x[i] - x[hull[-2]])) <= 0:
+            hull.pop()
+        hull.append(i)
+    return np.array(hull, dtype=int)
+
+
+def solve_segments(slopes, widths, owners, num_loans, budget, risk_coefficients=None, risk_bound=0):
+    """
+    Fills segments of convex piecewise-linear per-loan cost curves to minimize the total cost: every segment j of
+    loan owners[j] holds up to widths[j] at a cost of slopes[j] per unit, the fills sum to at most budget, and
+    optionally sum(risk_coefficients[owner] * fill) <= risk_bound. Convexity keeps the segments of a loan filling in
+    order, so this is a linear program, solved by HiGHS. Returns the total fill of every loan.
+    """
+    if len(slopes) == 0:
+        return np.zeros(num_loans)
+    rows, bounds = [np.ones(len(slopes))], [budget]
+    if risk_coefficients is not None:
+        rows.append(risk_coefficients[owners])
+        bounds.append(risk_bound)
+    result = linprog(slopes, A_ub=np.array(rows), b_ub=np.array(bounds), bounds=np.column_stack([np.zeros_like(widths),
+                                                                                                 widths]),
+                     method='highs')
+    if result.status != 0:
+        raise ValueError(f"No allocation satisfies the constraints: {result.message}")
+    return np.bincount(owners, weights=result.x, minlength=num_loans)
+
+
+def _hull_segments(curves):
+    # Segments of the lower convex hull of every loan's (x, cost) points, x increasing
+    slopes, widths, owners, hulls = [], [], [], []
+    for i, (x, cost) in enumerate(curves):
+        hull = lower_hull(x, cost)
+        hulls.append(hull)
+        width = np.diff(x[hull])
+        kept = width > 0
+        slopes.append(np.diff(cost[hull])[kept] / width[kept])
+        widths.append(width[kept])
+        owners.append(np.full(kept.sum(), i))
+    return (np.concatenate(slopes or [[]]), np.concatenate(widths or [[]]), np.concatenate(owners or [[]]).astype(int),
+            hulls)
+
+
+def _paydown_curves(loans, change):
+    # Every loan's (paydown, remaining cost) points at the balances where its cost per currency changes, x increasing
+    curves = []
+    for loan in loans:
+        curve = PaydownCurve(loan, change)
+        balances = curve.bounds[::-1]
+        curves.append((curve.balance - balances, balances * (curve.levels[::-1] - 1)))
+    return curves
+
+
+def volatility_excess(loans, max_volatility):
+    """
+    Every loan's get_volatility above max_volatility. The mortgage left after paying x_i off every loan is within the
+    bound while sum((A_i - x_i) * excess_i) <= 0, a constraint linear in the paydowns.
+    """
+    return np.array([loan.get_volatility() - max_volatility for loan in loans])
+
+
+def optimal_lump_sum(loans, extra_payment, change='payment', max_volatility=None):
+    """
+    Splits a lump sum between loans to minimize the remaining interest and indexation, optionally within
+    max_volatility. Solves the convex hulls of the loans' PaydownCurve, a relaxation that is exact only at the hull
+    vertices (see round_to_hull_vertices). Returns the amount paid down on every loan.
+    """
+    slopes, widths, owners, _ = _hull_segments(_paydown_curves(loans, change))
+
+    risk_coefficients, risk_bound = None, 0
+    if max_volatility is not None:
+        excess = volatility_excess(loans, max_volatility)
+        amounts = np.array([loan.loan_amount() for loan in loans], dtype=float)
+        risk_coefficients, risk_bound = -excess, -np.dot(amounts, excess)
+    return solve_segments(slopes, widths, owners, len(loans),
+                          min(extra_payment, sum(loan.loan_amount() for loan in loans)), risk_coefficients, risk_bound)
+
+
+def round_to_hull_vertices(loans, paydowns, change='payment'):
+    """
+    The split of optimal_lump_sum moved down to the last hull vertex of every loan, where the relaxation is exact. The
+    money this frees is spent by the exact greedy (allocate_lump_sum) on the loans that remain.
+    """
+    paydowns = np.asarray(paydowns, dtype=float)
+    rounded = np.zeros(len(loans))
+    for i, (x, cost) in enumerate(_paydown_curves(loans, change)):
+        vertices = x[lower_hull(x, cost)]
+        rounded[i] = vertices[np.searchsorted(vertices, paydowns[i] * (1 + 1e-9) + 1e-9, side='right') - 1]
+
+    remaining_loans = []
+    for loan, paydown in zip(loans, rounded):
+        remaining_loan = loan.clone()
+        if paydown > 0:
+            remaining_loan.apply_extra_payment(paydown, change)
+        remaining_loans.append(remaining_loan)
+    return rounded + allocate_lump_sum(remaining_loans, paydowns.sum() - rounded.sum(), change, exact=True)
+
+
+def optimal_monthly_budget(loans, extra_payment):
+    """
+    Splits an extra monthly payment between the loans out of their grace period to minimize their interest and
+    indexation, on the convex hulls of their payment curves. Returns the new number of months of every loan.
+    """
+    eligible = [i for i, loan in enumerate(loans) if
+                loan.loan_amount() > 0 and loan.grace_period == 0 and loan.num_of_months() > 1]
+    curves, terms = [], []
+    for i in eligible:
+        curve = ExtensionCurve(loans[i])
+        k = np.arange(curve.term, 0, -1)
+        curves.append((curve.payments[k] - curve.payments[curve.term], loans[i].loan_amount() * (curve.costs[k] - 1)))
+        terms.append(k)
+    slopes, widths, owners, hulls = _hull_segments(curves)
+    increases = solve_segments(slopes, widths, owners, len(eligible), extra_payment)
+
+    months = [loan.num_of_months() for loan in loans]
+    for i, (x, _), k, hull, increase in zip(eligible, curves, terms, hulls, increases):
+        # The last hull vertex the loan's share of the budget affords
+        vertex = hull[np.searchsorted(x[hull], increase * (1 + 1e-9) + 1e-9, side='right') - 1]
+        months[i] = loans[i].grace_period + int(k[vertex])
+    return months
+
+
+def unit_totals(loan, terms):
+    """
+    Total interest, total indexation and month 0 payment per currency of the loan for every number of amortization
+    months in terms, read off one batch of unit schedules.
+    """
+    rate = loan._rate_paths() if loan.rate_path is not None else loan.interest_rate
+    cpi = loan._cpi_paths() if loan.cpi_path is not None else loan.cpi
+    payment, _, inflation, interest, _ = amortize_batch(1, loan.grace_period + terms, rate, loan.grace_period, cpi)
+    return interest.sum(axis=1), inflation.sum(axis=1), payment[:, 0]
+
+
+def sweep_lump_sums(loans, extra_payments, change='payment', exact=False):
+    """
+    Mortgage.recycle_mortgage of every lump sum in extra_payments, from one allocate_lump_sums pass and the loans' unit
+    totals per term. Returns the interest, indexation, first payment and period savings, one value per sum.
+    """
+    extra_payments = np.asarray(extra_payments, dtype=float)
+    order = np.argsort(extra_payments)
+    paydowns, terms = allocate_lump_sums(loans, extra_payments[order], change, exact)
+
+    amounts = np.array([loan.loan_amount() for loan in loans], dtype=float)
+    grace_periods = np.array([loan.grace_period for loan in loans], dtype=int)
+    max_terms = np.maximum(np.array([loan.num_of_months() for loan in loans]) - grace_periods, 1)
+    # (3, loans, terms) interest, indexation and month 0 payment per currency, zero padded past every loan's term
+    tables = np.zeros((3, len(loans), max_terms.max(initial=1)))
+    for i, loan in enumerate(loans):
+        tables[:, i, :max_terms[i]] = unit_totals(loan, np.arange(1, max_terms[i] + 1))
+
+    def totals(balances, months):
+        # Interest, indexation and month 0 payment of the loans with these balances and terms
+        terms = np.asarray(months) - grace_periods
+        active = (balances > 0) & (terms > 0)
+        return (balances * active * tables[:, np.arange(len(loans)), np.clip(terms - 1, 0, None)]).sum(axis=1)
+
+    def period(balances, months):
+        # Mortgage.num_of_months: the longest term of the loans left, none when less than one currency unit is left
+        return max((m for balance, m in zip(balances, months) if balance > 0), default=0) if balances.sum() >= 1 else 0
+
+    months_before = [loan.num_of_months() for loan in loans]
+    before = totals(amounts, months_before)
+    savings = np.zeros((len(extra_payments), 4))
+    for j, row in enumerate(order):
+        # Rounded like Loan.apply_extra_payment, so the float residue of a repaid loan does not keep it alive
+        balances = np.round(np.maximum(amounts - paydowns[j], 0), BalanceDecimals)
+        if change.lower() == 'period':
+            months = [(loan.grace_period + int(term) if m > loan.grace_period else m) if balance > 0 else 0 for
+                      loan, balance, term, m in zip(loans, balances, terms[j], months_before)]
+            freed_payment = before[2] - totals(balances, months)[2]
+            if freed_payment > 1e-6 and balances.sum() > 0:
+                remaining_loans = []
+                for loan, balance, num_of_months in zip(loans, balances, months):
+                    remaining_loan = loan.clone()
+                    remaining_loan.set_amount(balance)
+                    remaining_loan.set_period(num_of_months)
+                    remaining_loans.append(remaining_loan)
+                months, _ = allocate_monthly_budget(remaining_loans, freed_payment)
+        else:
+            months = [m if balance > 0 else 0 for balance, m in zip(balances, months_before)]
+        # A mortgage with less than one currency unit left is fully repaid (Mortgage.is_fully_repaid)
+        after = totals(balances, months) if balances.sum() >= 1 else np.zeros(3)
+        savings[row] = [*(before - after), period(amounts, months_before) - period(balances, months)]
+
+    return {'Interest Savings': savings[:, 0], 'Indexation Savings': savings[:, 1],
+            'First Payment Savings': savings[:, 2], 'Period Savings': savings[:, 3]}
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+
+AMORTIZATION_COLUMNS = ['Month', 'Monthly Payment', 'Principal Payment', 'Inflation Payment', 'Interest Payment',
+                        'Remaining Balance']
+YEARLY_AGGREGATIONS = {'Month': 'last', 'Monthly Payment': 'sum', 'Principal Payment': 'sum',
+                       'Inflation Payment': 'sum', 'Interest Payment': 'sum', 'Remaining Balance': 'last'}
+
+
+def yearly_rollup(columns, aggregations):
+    """
+    Rolls monthly columns up to years in one NumPy pass: each column is zero padded to a multiple of 12 months,
+    reshaped to (years, 12) and summed, or the value of each year's last month is taken ('last').
+    """
+    num_months = len(next(iter(columns.values())))
+    num_years = -(-num_months // 12)
+    last_months = np.minimum(np.arange(1, num_years + 1) * 12, num_months) - 1
+    yearly = {}
+    for name, aggregation in aggregations.items():
+        values = np.asarray(columns[name])
+        if aggregation == 'sum':
+            yearly[name] = np.pad(values, (0, num_years * 12 - num_months)).reshape(num_years, 12).sum(axis=1)
+        else:
+            yearly[name] = values[last_months]
+    return yearly
+
+
+class LoanSchedule:
+    """
+    Columnar amortization schedule: one contiguous read-only array per column, month i at index i.
+    The pandas view is only built when a page asks for it (to_dataframe) and is cached afterwards.
+    Columns are float64 by default; compact() keeps a float32 copy of only the columns a batch job needs.
+    """
+    __slots__ = ('monthly_payment', 'principal_payment', 'inflation_payment', 'interest_payment', 'remaining_balance',
+                 '_length', '_frame', '_cumulative', '_yearly')
+
+    fields = {'Monthly Payment': 'monthly_payment',
+              'Principal Payment': 'principal_payment',
+              'Inflation Payment': 'inflation_payment',
+              'Interest Payment': 'interest_payment',
+              'Remaining Balance': 'remaining_balance'}
+
+    def __init__(self, monthly_payment, principal_payment, inflation_payment, interest_payment, remaining_balance,
+                 dtype=np.float64):
+        # A column given as None is not kept (see compact)
+        self.monthly_payment = LoanSchedule._freeze(monthly_payment, dtype)
+        self.principal_payment = LoanSchedule._freeze(principal_payment, dtype)
+        self.inflation_payment = LoanSchedule._freeze(inflation_payment, dtype)
+        self.interest_payment = LoanSchedule._freeze(interest_payment, dtype)
+        self.remaining_balance = LoanSchedule._freeze(remaining_balance, dtype)
+        self._length = max(len(getattr(self, field)) for field in LoanSchedule.fields.values()
+                           if getattr(self, field) is not None)
+        self._frame = None
+        self._cumulative = {}
+        self._yearly = None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, column):
+        values = getattr(self, LoanSchedule.fields[column])
+        if values is None:
+            raise KeyError(f"'{column}' is not kept by this compact schedule")
+        return values
+
+    def columns(self):
+        return [column for column, field in LoanSchedule.fields.items() if getattr(self, field) is not None]
+
+    def months(self):
+        return np.arange(1, len(self) + 1)
+
+    @property
+    def nbytes(self):
+        "Memory held by the columns and by the caches built from them (prefix sums and the pandas views)."
+        cached_frames = sum(int(frame.memory_usage(index=True, deep=False).sum()) for frame in (self._frame, self._yearly)
+                            if frame is not None)
+        return (sum(self[column].nbytes for column in self.columns()) +
+                sum(cumulative.nbytes for cumulative in self._cumulative.values()) + cached_frames)
+
+    def compact(self, columns=None, dtype=np.float32):
+        """
+        A copy that stores only the given columns (all of them by default) with the given dtype.
+        For large batch runs, e.g. compact(['Monthly Payment', 'Remaining Balance']) keeps 2 of the 5 columns at half
+        the width.
+        """
+        columns = self.columns() if columns is None else columns
+        return LoanSchedule(*(self[column] if column in columns else None for column in LoanSchedule.fields),
+                            dtype=dtype)
+
+    def cumulative(self, column):
+        if column not in self._cumulative:
+            # Accumulate in float64 even for compact schedules, totals are what the pages report
+            self._cumulative[column] = LoanSchedule._freeze(np.cumsum(self[column], dtype=np.float64), np.float64)
+        return self._cumulative[column]
+
+    def total(self, column, month=None):
+        """
+        Sum of the column over months 0..month (inclusive), or over the whole schedule when month is None.
+        Answered from the cached prefix sums, so it costs O(1) after the first query of the column.
+        """
+        if month is None:
+            month = len(self) - 1
+        if month < 0 or len(self) == 0:
+            return 0.0
+        return self.cumulative(column)[min(month, len(self) - 1)]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        if self._frame is None:
+            columns = {'Month': self.months()}
+            columns.update({name: self[name] for name in self.columns()})
+            self._frame = pd.DataFrame(columns, columns=[name for name in AMORTIZATION_COLUMNS if name in columns])
+        return self._frame
+
+    def yearly(self) -> pd.DataFrame:
+        if self._yearly is None:
+            columns = {'Month': self.months()}
+            columns.update({name: self[name] for name in self.columns()})
+            aggregations = {name: how for name, how in YEARLY_AGGREGATIONS.items() if name in columns}
+            self._yearly = pd.DataFrame(yearly_rollup(columns, aggregations)).astype(int)
+        return self._yearly
+
+    @staticmethod
+    def empty():
+        return LoanSchedule(*np.zeros((5, 1)))
+
+    @staticmethod
+    def _freeze(values, dtype):
+        if values is None:
+            return None
+        array = np.ascontiguousarray(values, dtype=dtype)
+        array.flags.writeable = False
+        return array
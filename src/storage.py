@@ -0,0 +1,86 @@
+import hashlib
+import importlib
+import struct
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from loan import LoanType
+
+# The modules whose code determines the stored schedules and summaries, a change to any of them makes them stale.
+# Named rather than imported, since mortgage and portfolio import this module.
+ENGINE_MODULES = ('constants', 'loan', 'schedule', 'irr', 'summary', 'finance_utils', 'mortgage', 'portfolio')
+
+
+@lru_cache(maxsize=None)
+def engine_hash():
+    "Hash of the amortization engine source, stored next to computed schedules to tell whether they are still valid."
+    digest = hashlib.sha256()
+    for name in ENGINE_MODULES:
+        digest.update(Path(importlib.import_module(name).__file__).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def encode_loan_type(loan_type):
+    "A loan type as a string: str types as they are, LoanType members by name ('LoanType.FIXED') and the default as ''."
+    if isinstance(loan_type, LoanType):
+        return str(loan_type)
+    return loan_type if isinstance(loan_type, str) else ''
+
+
+def decode_loan_type(loan_type):
+    "The loan type encode_loan_type stored."
+    if not loan_type:
+        return LoanType
+    prefix = LoanType.__name__ + '.'
+    if isinstance(loan_type, str) and loan_type.startswith(prefix) and loan_type[len(prefix):] in LoanType.__members__:
+        return LoanType[loan_type[len(prefix):]]
+    return loan_type
+
+
+def save_arrays(path, arrays):
+    """
+    Writes named arrays to an uncompressed .npz file. The members are stored as is, so load_arrays can map them
+    instead of reading them. Arrays must not hold Python objects: strings are stored as fixed width unicode.
+    """
+    with open(path, 'wb') as file:
+        np.savez(file, **arrays)
+
+
+def load_arrays(path, mmap_mode='r'):
+    """
+    Reads the arrays of an .npz file. With mmap_mode every stored (uncompressed) member is a memory map of its
+    bytes in the file, found from its zip local header and .npy header, so loading costs nothing until the data is
+    read. Scalars, empty and compressed members, or all members when mmap_mode is None, are read into memory.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            offset = _array_offset(file, info) if mmap_mode and info.compress_type == zipfile.ZIP_STORED else None
+            if offset is None:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+            else:
+                offset, shape, fortran_order, dtype = offset
+                arrays[name] = np.memmap(file, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def _array_offset(file, info):
+    "The file offset of a stored member's array data with its shape, order and dtype, or None if it is not mappable."
+    file.seek(info.header_offset)
+    local_header = file.read(30)
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    file.seek(info.header_offset + len(local_header) + name_length + extra_length)
+    version = np.lib.format.read_magic(file)
+    read_header = {(1, 0): np.lib.format.read_array_header_1_0, (2, 0): np.lib.format.read_array_header_2_0}
+    if version not in read_header:
+        return None
+    shape, fortran_order, dtype = read_header[version](file)
+    if dtype.hasobject or not shape or 0 in shape:
+        return None
+    return file.tell(), shape, fortran_order, dtype
@@ -0,0 +1,44 @@
+from typing import NamedTuple, Tuple
+
+
+class LoanSummary(NamedTuple):
+    """
+    Headline figures of a loan, computed once from its schedule by Loan.summary() and kept until the loan changes.
+    """
+    loan_type: object
+    amount: float
+    num_of_months: int
+    interest_rate: float
+    cpi: float
+    grace_period: int
+    first_payment: float
+    average_monthly_payment: float
+    highest_monthly_payment: float
+    total_interest: float
+    total_inflation: float
+    total_payments: float
+    cost_per_currency: float
+    volatility: float
+
+
+class MortgageSummary(NamedTuple):
+    """
+    Headline figures of a mortgage and of each of its loans, computed once by Mortgage.summary() and kept until the
+    mortgage schedule changes. The summary tables and charts of the pages read from it.
+    """
+    name: str
+    amount: float
+    num_of_months: int
+    average_interest_rate: float
+    cpi_bound_amount: float
+    first_payment: float
+    average_monthly_payment: float
+    highest_monthly_payment: float
+    total_interest: float
+    total_inflation: float
+    total_payments: float
+    cost: float
+    cost_per_currency: float
+    irr: float
+    volatility: float
+    loans: Tuple[LoanSummary, ...]
@@ -0,0 +1,88 @@
+import numpy as np
+import numpy_financial as npf
+import pandas as pd
+import pytest
+
+from loan import Loan, LoanBatch
+from mortgage import Mortgage
+from schedule import LoanSchedule
+
+# (amount, num_of_months, interest_rate, grace_period, cpi)
+TERMS = [(100000, 120, 3, 0, 0),
+         (250000, 300, 4.5, 0, 2.5),
+         (80000, 60, 0, 0, 0),
+         (80000, 60, 0, 0, 2),
+         (500000, 240, 5.2, 20, 0),
+         (300000, 264, 6, 12, 2.5),
+         (50000, 12, 2, 12, 1.5),
+         (1000, 1, 7, 0, 0)]
+
+
+def reference_schedule(amount, num_of_months, interest_rates, grace_period, cpis):
+    """
+    The month by month loop the closed-form engine replaced: the grace period pays nothing, then every month the
+    balance is indexed by that month's CPI and re-amortized over the remaining term at that month's rate.
+    """
+    rates = np.broadcast_to(interest_rates, (num_of_months,))
+    cpis = np.broadcast_to(cpis, (num_of_months,))
+    rows = [(0, 0, 0, 0, amount) for _ in range(grace_period)]
+    balance = amount
+    for month in range(grace_period, num_of_months):
+        r = (rates[month] / 12) / 100
+        monthly_cpi = 1 + (cpis[month] / 12) / 100
+        balance = balance * monthly_cpi
+        payment = -npf.pmt(r, num_of_months - month, balance)
+        interest = balance * r
+        inflation = balance * (1 - 1 / monthly_cpi)
+        principal = payment - interest
+        balance -= principal
+        rows.append((payment, principal, inflation, interest, balance))
+    return np.array(rows).T
+
+
+def assert_schedule(schedule, expected):
+    for column, values in zip(LoanSchedule.fields, expected):
+        np.testing.assert_allclose(schedule[column], values, rtol=1e-9, atol=1e-6, err_msg=column)
+
+
+@pytest.mark.parametrize('amount, num_of_months, interest_rate, grace_period, cpi', TERMS)
+def test_loan_schedule_matches_reference(amount, num_of_months, interest_rate, grace_period, cpi):
+    loan = Loan(amount, num_of_months, interest_rate, grace_period=grace_period, cpi=cpi)
+    assert_schedule(loan.schedule, reference_schedule(amount, num_of_months, interest_rate, grace_period, cpi))
+
+
+def test_loan_batch_matches_reference():
+    amount, num_of_months, interest_rate, grace_period, cpi = (np.array(values) for values in zip(*TERMS))
+    batch = LoanBatch(amount, num_of_months, interest_rate, grace_period, cpi)
+    for i, terms in enumerate(TERMS):
+        assert_schedule(batch.schedule(i), reference_schedule(*terms))
+
+
+def test_rate_and_cpi_paths_match_reference():
+    rng = np.random.default_rng(0)
+    rate_path = 4 + np.cumsum(rng.normal(0, 0.2, 180))
+    cpi_path = 2 + np.cumsum(rng.normal(0, 0.1, 180))
+    for grace_period in [0, 12]:
+        loan = Loan(300000, 180, 4, grace_period=grace_period, rate_path=rate_path, cpi_path=cpi_path)
+        assert_schedule(loan.schedule, reference_schedule(300000, 180, rate_path, grace_period, cpi_path))
+
+    rate_paths = 4 + np.cumsum(rng.normal(0, 0.2, (3, 180)), axis=1)
+    simulated = Loan(300000, 180, 4, grace_period=6, cpi=2.5).simulate(rate_paths)
+    for i, path in enumerate(rate_paths):
+        assert_schedule(simulated.schedule(i), reference_schedule(300000, 180, path, 6, 2.5))
+
+
+def test_mortgage_aggregates_match_reference():
+    frame = pd.DataFrame({'amount': [terms[0] for terms in TERMS], 'num_of_months': [terms[1] for terms in TERMS],
+                          'interest_rate': [terms[2] for terms in TERMS], 'loan_type': 'FIXED',
+                          'grace_period': [terms[3] for terms in TERMS], 'cpi': [terms[4] > 0 for terms in TERMS]})
+    mortgage = Mortgage.from_dataframe(frame, cpi=2.5)
+    mortgage.payback_loan(1, 50000)
+    mortgage.payback_loan(4, 100000, change='period')
+
+    expected = np.zeros((len(LoanSchedule.fields), mortgage.num_of_months()))
+    for loan in mortgage.loans:
+        columns = reference_schedule(loan.loan_amount(), loan.num_of_months(), loan.interest_rate, loan.grace_period,
+                                     loan.cpi)
+        expected[:, :columns.shape[1]] += columns
+    assert_schedule(mortgage.schedule, expected)
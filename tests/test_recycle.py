@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from benchmark import random_loan_terms
+from loan import Loan
+from mortgage import Mortgage
+
+
+def random_mortgage(num_loans, seed):
+    terms = random_loan_terms(num_loans, seed)
+    return Mortgage([Loan(terms['amount'][i], int(terms['num_of_months'][i]), terms['interest_rate'][i],
+                          grace_period=int(terms['grace_period'][i]), cpi=terms['cpi'][i]) for i in range(num_loans)])
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('exact', [False, True])
+def test_recycle_sweep_matches_recycle_mortgage(seed, exact):
+    "Every row of the sweep is the recycle of that lump sum, on sums off the step grid and near full payoffs."
+    mortgage = random_mortgage(10, seed)
+    amount = mortgage.loan_amount()
+    extra_payments = np.concatenate([np.random.default_rng(seed).uniform(0, amount, 20).round(2),
+                                     [amount - 1, amount - 0.5, amount]])
+    sweeps = Mortgage.recycle_sweep(mortgage, extra_payments, exact=exact)
+    for change, sweep in sweeps.items():
+        for j, extra_payment in enumerate(extra_payments):
+            recycled = Mortgage.recycle_mortgage(mortgage, extra_payment, change=change, exact=exact)
+            expected = [mortgage.total_interest_payments() - recycled.total_interest_payments(),
+                        mortgage.total_inflation_payments() - recycled.total_inflation_payments(),
+                        mortgage.monthly_payment(0) - recycled.monthly_payment(0),
+                        mortgage.num_of_months() - recycled.num_of_months()]
+            np.testing.assert_allclose([values[j] for values in sweep.values()], expected, rtol=1e-9, atol=1e-4,
+                                       err_msg=f"extra_payment={extra_payment:,.2f}, change={change}")
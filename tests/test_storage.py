@@ -0,0 +1,20 @@
+import numpy as np
+
+from loan import Loan, LoanType
+from mortgage import Mortgage
+
+
+def test_mortgage_save_load_keeps_every_loan_schedule(tmp_path):
+    mortgage = Mortgage([Loan(100000, 120, 3, LoanType.FIXED), Loan(200000, 240, 4, "Prime", grace_period=12),
+                         Loan(50000, 60, 2, cpi=2.5, compact=True, keep_columns=['Monthly Payment'])], name='Saved')
+    mortgage.save(tmp_path / 'mortgage.npz')
+    loaded = Mortgage.load(tmp_path / 'mortgage.npz')
+
+    assert loaded.name == 'Saved'
+    for loan, loaded_loan in zip(mortgage.loans, loaded.loans):
+        assert loaded_loan.loan_type == loan.loan_type
+        assert (loaded_loan.compact, loaded_loan.keep_columns) == (loan.compact, loan.keep_columns)
+        assert loaded_loan.schedule.columns() == loan.schedule.columns()
+        for column in loan.schedule.columns():
+            np.testing.assert_array_equal(loaded_loan.schedule[column], loan.schedule[column])
+    assert loaded.loans[0].total_interest_payments() == mortgage.loans[0].total_interest_payments()